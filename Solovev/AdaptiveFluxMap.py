@@ -0,0 +1,181 @@
+# In this file, we compute flux maps on adaptive quadtree grids, which are
+# refined only where the contours of interest (by default the plasma boundary
+# psi = 0) need to be resolved, instead of on the uniform grid of main.py.
+#
+# The domain is first divided into n_root x n_root cells. At each level of
+# refinement, psi, its gradient and its Hessian are evaluated exactly at the
+# center of all the cells of that level, and a cell is divided into four if:
+#
+#   - one of the contour levels may cross it, according to the second order
+#     Taylor expansion of psi around its center, and
+#   - the error made by locating that contour with a linear interpolation of
+#     psi along the edges of the cell, estimated as
+#     (|psi_xx|*hx**2 + |psi_yy|*hy**2)/(8*|grad(psi)|), is larger than tol.
+#
+# The second criterion forces the refinement down to max_level around the X
+# point, where grad(psi) vanishes, and leaves the cells crossed by smooth flux
+# surfaces comparatively coarse. Where even the cells of max_level do not meet
+# it, that is where
+#
+#   |grad(psi)| < (|psi_xx|*hx**2 + |psi_yy|*hy**2)/(8*tol)
+#
+# for the sizes hx, hy of those cells, the contours are not located to within
+# tol. This happens near the points where grad(psi) = 0: in a small
+# neighbourhood of an X point, but over a large part of the inboard boundary
+# at the equilibrium beta limit, where the Hessian of psi is singular and
+# |grad(psi)| only grows quadratically along the boundary (for the ITER
+# example of main.py, about a quarter of the boundary segments end more than
+# 1e-5 away from it with the default parameters, up to 1e-2). Cells which cannot contain a contour are not
+# refined, unless tol_psi is given, in which case all the cells where the
+# error of the bilinear interpolation of psi, estimated as
+# (|psi_xx|*hx**2 + |psi_yy|*hy**2)/8, is larger than tol_psi are refined as
+# well. psi is finally evaluated at the corners of the leaf cells.
+#
+# The result is stored as arrays over the leaf cells only: their level and
+# integer position (i,j) at that level, and the values of psi at their center
+# and their four corners. The contours are extracted cell by cell with the
+# marching squares algorithm, and psi can be interpolated at arbitrary points.
+# Contour segments in neighbouring cells of different levels do not
+# necessarily share their end points, but both are within tol of the exact
+# contour (where it is resolved, see above).
+
+import numpy as np
+from PointEvaluation import evaluate_points
+
+def adaptive_flux_map(C, A, xlim, ylim, levels=(0.,), n_root=16, max_level=8, tol=1e-5, tol_psi=None):
+    # Adaptive flux map of the domain xlim[0] <= x <= xlim[1],
+    # ylim[0] <= y <= ylim[1], refined to resolve the contours psi = levels to
+    # within a distance tol, except near the points where grad(psi) vanishes,
+    # where max_level limits the refinement (see above). Return a dictionary with the arrays "level",
+    # "i", "j", "center" and "corners" over the leaf cells (the corners being
+    # ordered counterclockwise from (x0,y0)), the parameters of the grid and
+    # the total number of points at which psi was evaluated.
+    levels = np.atleast_1d(np.asarray(levels, dtype=float))
+    x0, y0 = xlim[0], ylim[0]
+    width, height = xlim[1] - xlim[0], ylim[1] - ylim[0]
+
+    j, i = np.divmod(np.arange(n_root**2), n_root)
+    leaves = {"level": [], "i": [], "j": [], "center": []}
+    n_evaluations = 0
+    for level in range(max_level + 1):
+        if i.size == 0:
+            break
+        hx = width/(n_root << level)
+        hy = height/(n_root << level)
+        xc = x0 + (i + 0.5)*hx
+        yc = y0 + (j + 0.5)*hy
+        psi, psix, psiy, psixx, psixy, psiyy = evaluate_points(C, A, xc, yc, quantities=("psi", "psix", "psiy", "psixx", "psixy", "psiyy")).T
+        n_evaluations += i.size
+
+        variation = np.abs(psix)*hx/2 + np.abs(psiy)*hy/2 + (np.abs(psixx)*hx**2 + 2*np.abs(psixy)*hx*hy + np.abs(psiyy)*hy**2)/8
+        crossed = np.any(np.abs(psi[:, np.newaxis] - levels) <= 1.5*variation[:, np.newaxis], axis=1)
+        interpolation_error = (np.abs(psixx)*hx**2 + np.abs(psiyy)*hy**2)/8
+        with np.errstate(divide="ignore"):
+            refine = crossed & (interpolation_error/np.hypot(psix, psiy) > tol)
+        if tol_psi is not None:
+            refine |= interpolation_error > tol_psi
+        refine &= level < max_level
+
+        leaf = ~refine
+        leaves["level"].append(np.full(np.sum(leaf), level, dtype=np.int8))
+        leaves["i"].append(i[leaf])
+        leaves["j"].append(j[leaf])
+        leaves["center"].append(psi[leaf])
+        i = (2*i[refine, np.newaxis] + [0, 1, 0, 1]).ravel()
+        j = (2*j[refine, np.newaxis] + [0, 0, 1, 1]).ravel()
+
+    flux_map = {name: np.concatenate(value) for name, value in leaves.items()}
+    flux_map.update({"x0": x0, "y0": y0, "width": width, "height": height, "n_root": n_root, "max_level": max_level})
+
+    # psi at the corners of the leaves, each distinct corner being evaluated
+    # once. The corners are identified by their integer coordinates on the
+    # finest grid.
+    shift = max_level - flux_map["level"].astype(np.int64)
+    n_finest = n_root << max_level
+    I = (flux_map["i"].astype(np.int64)[:, np.newaxis] + [0, 1, 1, 0]) << shift[:, np.newaxis]
+    J = (flux_map["j"].astype(np.int64)[:, np.newaxis] + [0, 0, 1, 1]) << shift[:, np.newaxis]
+    keys, inverse = np.unique(J*(n_finest + 1) + I, return_inverse=True)
+    Jc, Ic = np.divmod(keys, n_finest + 1)
+    corner_values = evaluate_points(C, A, x0 + Ic*width/n_finest, y0 + Jc*height/n_finest)[:, 0]
+    flux_map["corners"] = corner_values[inverse.reshape(I.shape)]
+    flux_map["n_evaluations"] = n_evaluations + keys.size
+    return flux_map
+
+def _cell_geometry(flux_map):
+    # Lower left corner and size of each leaf
+    n = flux_map["n_root"] << flux_map["level"].astype(np.int64)
+    hx = flux_map["width"]/n
+    hy = flux_map["height"]/n
+    return flux_map["x0"] + flux_map["i"]*hx, flux_map["y0"] + flux_map["j"]*hy, hx, hy
+
+def contour_segments(flux_map, level=0.):
+    # Segments of the contour psi = level, as an array of shape (N,2,2) of
+    # end points (which can be drawn with matplotlib.collections.LineCollection).
+    # In cells where the contour crosses all four edges, the value of psi at
+    # the center decides which pairs of crossings are connected.
+    v = flux_map["corners"] - level
+    xa, ya, hx, hy = _cell_geometry(flux_map)
+    corner_x = xa[:, np.newaxis] + hx[:, np.newaxis]*[0, 1, 1, 0]
+    corner_y = ya[:, np.newaxis] + hy[:, np.newaxis]*[0, 0, 1, 1]
+
+    # Crossing points on the edges (k, k+1) of each cell
+    va, vb = v, np.roll(v, -1, axis=1)
+    crosses = (va < 0) != (vb < 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = np.where(crosses, va/(va - vb), 0)
+    points = np.stack((corner_x + t*(np.roll(corner_x, -1, axis=1) - corner_x),
+                       corner_y + t*(np.roll(corner_y, -1, axis=1) - corner_y)), axis=-1)
+
+    count = np.sum(crosses, axis=1)
+    segments = []
+    two = np.flatnonzero(count == 2)
+    if two.size:
+        edges = np.nonzero(crosses[two])[1].reshape(-1, 2)
+        segments.append(np.stack((points[two, edges[:, 0]], points[two, edges[:, 1]]), axis=1))
+    four = np.flatnonzero(count == 4)
+    if four.size:
+        # If the center is on the same side as the first corner, the contour
+        # cuts off the second and fourth corners, and otherwise the first and
+        # third ones
+        same = (flux_map["center"][four] - level < 0) == (v[four, 0] < 0)
+        pairs = np.where(same[:, np.newaxis], [[0, 1, 2, 3]], [[3, 0, 1, 2]])
+        p = points[four[:, np.newaxis], pairs]
+        segments += [p[:, 0:2], p[:, 2:4]]
+    return np.concatenate(segments) if segments else np.empty((0, 2, 2))
+
+def interpolate(flux_map, x, y):
+    # Bilinear interpolation of psi at the points (x,y) from the corners of the
+    # leaves containing them. The leaves are located by looking up the cell
+    # containing each point at every level, from the finest to the coarsest.
+    # Points outside of the domain of the flux map (or NaN) raise a
+    # ValueError rather than being extrapolated from the border leaves.
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n_root, max_level = flux_map["n_root"], flux_map["max_level"]
+    n_finest = n_root << max_level
+    level = flux_map["level"].astype(np.int64)
+    keys = (level*n_finest + flux_map["j"])*n_finest + flux_map["i"]
+    order = np.argsort(keys)
+    keys = keys[order]
+
+    u = (x - flux_map["x0"])/flux_map["width"]
+    w = (y - flux_map["y0"])/flux_map["height"]
+    if not np.all((u >= 0) & (u <= 1) & (w >= 0) & (w <= 1)):
+        raise ValueError("some points are outside of the domain of the flux map")
+    # The leaves cover the whole domain, and the points on its upper edges
+    # belong to the last cells of each level
+    leaf = np.full(x.shape, -1)
+    for lev in range(max_level, -1, -1):
+        n = n_root << lev
+        i = np.clip((u*n).astype(np.int64), 0, n - 1)
+        j = np.clip((w*n).astype(np.int64), 0, n - 1)
+        k = np.searchsorted(keys, (lev*n_finest + j)*n_finest + i)
+        k = np.minimum(k, len(keys) - 1)
+        found = (leaf < 0) & (keys[k] == (lev*n_finest + j)*n_finest + i)
+        leaf[found] = order[k[found]]
+
+    xa, ya, hx, hy = _cell_geometry(flux_map)
+    s = (x - xa[leaf])/hx[leaf]
+    t = (y - ya[leaf])/hy[leaf]
+    c = flux_map["corners"][leaf]
+    return (1-s)*(1-t)*c[..., 0] + s*(1-t)*c[..., 1] + s*t*c[..., 2] + (1-s)*t*c[..., 3]
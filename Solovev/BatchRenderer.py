@@ -0,0 +1,222 @@
+# In this file, we render the flux surfaces of the equilibria of large
+# parameter scans to PNG images or to an animation, for visual checks, without
+# a display and much faster than running main.py for each case.
+#
+# Instead of evaluating psi on a 2000x2000 grid and contouring it as in main.py,
+# the flux surfaces are computed directly as polylines with flux_surfaces
+# (see FluxSurfaces.py), which only requires psi at a few thousand points per
+# equilibrium. A Renderer holds a single figure, drawn with the Agg backend
+# without pyplot, whose axes, labels and line collection are created once and
+# updated for each frame. Scans are divided into chunks of cases, which are
+# rendered by a pool of worker processes, each with its own Renderer, and
+# written to PNG files, or sent back in order to the main process and encoded
+# into an animation. The number of chunks waiting to be written is limited,
+# so that memory usage does not grow with the size of the scan.
+#
+# Typical usage:
+#
+#   for path in render_scan("frames/case{:05d}.png", "asym_single_null", 0.32,
+#                           np.linspace(1.5, 1.9, 100)[:, np.newaxis], np.linspace(0.2, 0.45, 100),
+#                           -0.155, 0.88, -0.6, workers=8):
+#       pass
+#   render_animation("scan.gif", "symmetric", 0.32, np.linspace(1.5, 1.9, 50), 0.33, -0.155)
+
+import collections
+import os
+import shutil
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
+from PIL import Image
+from Equilibrium import parameter_names, solve_parameter_sets
+from ExactSolutions import n_homogeneous
+from FluxSurfaces import flux_surfaces
+
+psi_n_default = np.linspace(0.05, 1, 20)
+
+################################################################################
+#
+#   Rendering of a single frame
+#
+################################################################################
+
+class Renderer:
+    # Figure reused for all the frames, with the layout of the plots of main.py
+
+    def __init__(self, figsize=(6.4, 6.4), dpi=100, cmap="copper_r", linewidth=1., compress_level=1):
+        self.compress_level = compress_level
+        self.figure = Figure(figsize=figsize, dpi=dpi)
+        self.canvas = FigureCanvasAgg(self.figure)
+        self.axes = self.figure.add_subplot()
+        self.axes.axvline(x=0.0, linestyle="--", color="black")
+        self.axes.set_xlabel("$R/R_{0}$", fontsize=14)
+        self.axes.set_ylabel("$Z/R_{0}$", fontsize=14)
+        self.axes.set_aspect("equal", adjustable="box")
+        self.lines = LineCollection([], cmap=cmap, linewidths=linewidth)
+        self.lines.set_clim(0, 1)
+        self.axes.add_collection(self.lines)
+        self.title = self.axes.set_title("", fontsize=10)
+        self.limits = None
+        self.background = None
+
+    def draw(self, polylines, psi_n, title, xlim, ylim):
+        # Rasterize the polylines, of shape (len(psi_n),n,2), colored by their
+        # normalized flux psi_n. The background (axes, ticks and labels) is
+        # only drawn again when the limits change, and is otherwise restored
+        # from a copy before the lines and the title are drawn on it.
+        if (tuple(xlim), tuple(ylim)) != self.limits:
+            self.limits = (tuple(xlim), tuple(ylim))
+            self.axes.set_xlim(xlim)
+            self.axes.set_ylim(ylim)
+            self.lines.set_visible(False)
+            self.title.set_visible(False)
+            self.canvas.draw()
+            self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+            self.lines.set_visible(True)
+            self.title.set_visible(True)
+        self.canvas.restore_region(self.background)
+        self.lines.set_segments(polylines)
+        self.lines.set_array(np.asarray(psi_n, dtype=float))
+        self.title.set_text(title)
+        self.axes.draw_artist(self.lines)
+        self.axes.draw_artist(self.title)
+
+    def save(self, path):
+        # Write the last frame drawn to a PNG file, without drawing it again
+        # as savefig would
+        Image.fromarray(self.rgba()).save(path, compress_level=self.compress_level)
+
+    def rgba(self):
+        # Copy of the last frame drawn, of shape (height,width,4)
+        return np.array(self.canvas.buffer_rgba())
+
+def flux_surface_polylines(C, A, psi_n=psi_n_default, n_theta=256):
+    # Closed polylines along the flux surfaces psi_n, of shape
+    # (len(psi_n),n_theta+1,2)
+    x, y = flux_surfaces(C, A, psi_n, n_theta)
+    polylines = np.stack((x, y), axis=-1)
+    return np.concatenate((polylines, polylines[:, :1]), axis=1)
+
+def _title(eq_type, parameters):
+    return "%s\n" % eq_type + "  ".join("%s=%.4g" % (name, value) for name, value in zip(parameter_names, parameters)
+                                        if eq_type == "asym_single_null" or name not in ("xsep", "ysep"))
+
+################################################################################
+#
+#   Scans
+#
+################################################################################
+
+# Renderer of each worker process
+_renderer = None
+
+def _render_chunk(eq_type, indices, parameters, psi_n, n_theta, xlim, ylim, path_template, figure_options):
+    # Render the cases of one chunk, and return the paths of the PNG files if
+    # path_template is given, and the RGBA images otherwise. Cases which
+    # cannot be solved are rendered as empty frames.
+    global _renderer
+    if _renderer is None:
+        _renderer = Renderer(**figure_options)
+    values = solve_parameter_sets(eq_type, parameters, derived=False)
+    results = []
+    for index, p, v in zip(indices, parameters, values):
+        # A is shown as solved, since it is computed at the beta limit
+        title = _title(eq_type, np.concatenate((p[:3], v[n_homogeneous:n_homogeneous+1], p[4:])))
+        try:
+            polylines = flux_surface_polylines(v[:n_homogeneous], v[n_homogeneous], psi_n, n_theta)
+        except (RuntimeError, np.linalg.LinAlgError, ValueError):
+            polylines = np.empty((0, 2, 2))
+            title += "  (no solution)"
+        _renderer.draw(polylines, psi_n[:len(polylines)], title, xlim, ylim)
+        if path_template is None:
+            results.append(_renderer.rgba())
+        else:
+            path = path_template.format(index)
+            _renderer.save(path)
+            results.append(path)
+    return results
+
+def _scan(eq_type, epsilon, kappa, delta, A, xsep, ysep, path_template, psi_n, n_theta, workers, chunk_size,
+          xlim, ylim, figure_options):
+    # Generator of the results of _render_chunk for all the chunks of the
+    # scan, in order
+    parameters = np.broadcast_arrays(*[np.asarray(v, dtype=float) for v in (epsilon, kappa, delta, A, xsep, ysep)])
+    parameters = np.column_stack([p.ravel() for p in parameters])
+    epsilon, kappa = parameters[:, 0], parameters[:, 1]
+    # Common limits for all the frames, enclosing all the plasmas with the
+    # margins of main.py
+    bottom = parameters[:, 5] if eq_type == "asym_single_null" else -kappa*epsilon
+    if xlim is None:
+        xlim = (0, np.max(1 + epsilon) + 0.25)
+    if ylim is None:
+        ylim = (np.min(bottom) - 0.2, np.max(kappa*epsilon) + 0.2)
+    psi_n = np.asarray(psi_n, dtype=float)
+    chunks = [np.arange(start, min(start + chunk_size, len(parameters))) for start in range(0, len(parameters), chunk_size)]
+    arguments = lambda chunk: (eq_type, chunk, parameters[chunk], psi_n, n_theta, xlim, ylim, path_template, figure_options)
+
+    workers = workers or os.cpu_count()
+    if workers == 1:
+        for chunk in chunks:
+            yield _render_chunk(*arguments(chunk))
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = collections.deque()
+        chunks = iter(chunks)
+        for chunk in chunks:
+            pending.append(pool.submit(_render_chunk, *arguments(chunk)))
+            if len(pending) >= 2*workers:
+                break
+        while pending:
+            result = pending.popleft().result()
+            chunk = next(chunks, None)
+            if chunk is not None:
+                pending.append(pool.submit(_render_chunk, *arguments(chunk)))
+            yield result
+
+def render_scan(path_template, eq_type, epsilon, kappa, delta, A, xsep=0., ysep=0., psi_n=psi_n_default,
+                n_theta=256, workers=1, chunk_size=16, xlim=None, ylim=None, **figure_options):
+    # Render the flux surfaces psi_n of the equilibria of a scan to PNG files.
+    # The parameters are broadcast against each other, and the image of the
+    # i-th parameter set in C order is written to path_template.format(i).
+    # The cases are rendered in chunks of chunk_size by workers processes
+    # (all the available cores if None). By default, all the frames have the
+    # same limits, which enclose all the plasmas. figure_options are passed
+    # to Renderer. This is a generator, which yields the paths of the images
+    # once they have been written, in order.
+    for paths in _scan(eq_type, epsilon, kappa, delta, A, xsep, ysep, path_template, psi_n, n_theta, workers,
+                       chunk_size, xlim, ylim, figure_options):
+        yield from paths
+
+def render_animation(path, eq_type, epsilon, kappa, delta, A, xsep=0., ysep=0., fps=10, psi_n=psi_n_default,
+                     n_theta=256, workers=1, chunk_size=16, xlim=None, ylim=None, **figure_options):
+    # Render the scan as an animation, with one frame per parameter set in C
+    # order. GIF files are written with Pillow, and the other formats (such
+    # as .mp4) with ffmpeg, which must then be installed. The frames are
+    # encoded as they arrive from the workers.
+    frames = (frame for chunk in _scan(eq_type, epsilon, kappa, delta, A, xsep, ysep, None, psi_n, n_theta,
+                                       workers, chunk_size, xlim, ylim, figure_options) for frame in chunk)
+    if path.lower().endswith(".gif"):
+        images = (Image.fromarray(frame).convert("RGB") for frame in frames)
+        first = next(images)
+        first.save(path, save_all=True, append_images=images, duration=1000/fps, loop=0)
+        return
+    if shutil.which("ffmpeg") is None:
+        raise RuntimeError("ffmpeg is needed to write %s, use a .gif file instead" % path)
+    first = next(frames)
+    height, width = first.shape[:2]
+    encoder = subprocess.Popen(["ffmpeg", "-loglevel", "error", "-y", "-f", "rawvideo", "-pix_fmt", "rgba",
+                                "-s", "%dx%d" % (width, height), "-r", str(fps), "-i", "-",
+                                "-pix_fmt", "yuv420p", "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2", path],
+                               stdin=subprocess.PIPE)
+    try:
+        encoder.stdin.write(first.tobytes())
+        for frame in frames:
+            encoder.stdin.write(frame.tobytes())
+    finally:
+        encoder.stdin.close()
+        encoder.wait()
+    if encoder.returncode:
+        raise RuntimeError("ffmpeg failed with exit status %d" % encoder.returncode)
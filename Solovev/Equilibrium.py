@@ -0,0 +1,180 @@
+# In this file, we construct and solve the linear system for the coefficients
+# C of the general solution to the Grad-Shafranov equation,
+#
+#   psi = C[0]*psi1 + ... + C[11]*psi12 + A*psipart1 + (1-A)*psipart2
+#
+# following A.J. Cerfon and J.P. Freidberg, ``One size fits all" analytic
+# solutions to the Grad-Shafranov equation, Physics of Plasmas 17, 032502 (2010)
+#
+# Three equilibrium types are available:
+#	- simple up-down symmetric equilibrium, associated with the string "symmetric"
+#	- up-down symmetric equilibrium at the equilibrium beta limit, associated with the string "symmetric_beta_limit"
+#	- up-down asymmetric equilibrium with a single-null point, associated with the string "asym_single_null"
+#
+# The parameters epsilon, kappa, delta, A, xsep and ysep can be scalars or
+# arrays (which are broadcast against each other), in which case the systems
+# for all the parameter sets are assembled and solved at once.
+
+import numpy as np
+from ExactSolutions import basis, n_homogeneous
+from FluxSurfaces import magnetic_axis
+
+# Columns of the particular solutions psipart1 and psipart2 in the rows of the
+# boundary conditions, which follow those of the homogeneous solutions
+_p1, _p2 = n_homogeneous, n_homogeneous + 1
+
+eq_types = ("symmetric", "symmetric_beta_limit", "asym_single_null")
+
+parameter_names = ("epsilon", "kappa", "delta", "A", "xsep", "ysep")
+
+# Parameters which do not enter the solution of each equilibrium type: the X
+# point for symmetric equilibria, and A at the equilibrium beta limit, where
+# it is computed
+unused_parameters = {"symmetric": ("xsep", "ysep"), "symmetric_beta_limit": ("A", "xsep", "ysep"),
+                     "asym_single_null": ()}
+
+# Values returned by solve_parameter_sets
+value_names = tuple("C%d" % k for k in range(n_homogeneous)) + ("A", "ysep", "x_axis", "y_axis", "psi_axis")
+
+def _constraint(point, terms):
+    # Row of the boundary conditions for all the functions in basis, for the
+    # linear combination of derivatives terms = [(weight, name), ...] evaluated
+    # at point = (x,y). The result has shape (...,n_homogeneous+2).
+    x, y = point
+    shape = np.broadcast(x, y, *[w for w, _ in terms]).shape
+    row = np.zeros(shape + (len(basis["psi"]),))
+    for weight, name in terms:
+        for k, f in enumerate(basis[name]):
+            row[..., k] += weight*f(x, y)
+    return row
+
+def assemble_system(eq_type, epsilon, kappa, delta, A, xsep, ysep):
+    # Return the matrix M and the right-hand side b of the boundary conditions,
+    # of shapes (...,n,n) and (...,n), for the given equilibrium type
+    epsilon, kappa, delta, A, xsep, ysep = np.broadcast_arrays(*[np.asarray(v, dtype=float) for v in (epsilon, kappa, delta, A, xsep, ysep)])
+
+    alpha = np.arcsin(delta) #alpha as defined in the article
+    slope1 = 0 #outer equatorial point slope
+    slope2 = 0 #inner equatorial point slope
+    curv1 = -(1+alpha)**2/(epsilon*kappa**2) #curvature at the outboard midplane
+    curv2 = -kappa/(epsilon*(np.cos(alpha))**2) #curvature at the top
+    curv3 = (1-alpha)**2/(epsilon*kappa**2) #curvature at the inboard midplane
+
+    outer = (1+epsilon, 0*epsilon) #outer equatorial point
+    inner = (1-epsilon, 0*epsilon) #inner equatorial point
+    top = (1-epsilon*delta, kappa*epsilon) #upper high point
+    xpoint = (xsep, ysep) #lower X point
+
+    ################################################################################
+    #
+    #   Construct the matrix M of the boundary conditions for the funtions
+    #   which are solutions to the homogeneous equation, and the vector b of
+    #   the boundary conditions for the particular solutions to the equation
+    #
+    ################################################################################
+
+    match eq_type:
+        case "symmetric":
+            rows = [_constraint(outer, [(1, "psi")]), #outer equatorial point
+                    _constraint(inner, [(1, "psi")]), #inner equatorial point
+                    _constraint(top, [(1, "psi")]), #upper high point
+                    _constraint(top, [(1, "psix")]), #upper high point maximum
+                    _constraint(outer, [(curv1, "psix"), (1, "psiyy")]), #curvature condition at outer equatorial point
+                    _constraint(inner, [(curv3, "psix"), (1, "psiyy")]), #curvature condition at inner equatorial point
+                    _constraint(top, [(curv2, "psiy"), (1, "psixx")])] #curvature condition at top
+            R = np.stack(rows, axis=-2)
+            M = R[..., 0:7]
+            b = -(A[..., np.newaxis]*R[..., _p1] + (1-A[..., np.newaxis])*R[..., _p2])
+
+        case "symmetric_beta_limit":
+            # A is an unknown, determined by the equilibrium beta limit
+            # condition, and is the last component of the solution
+            rows = [_constraint(outer, [(1, "psi")]), #outer equatorial point
+                    _constraint(inner, [(1, "psi")]), #inner equatorial point
+                    _constraint(top, [(1, "psi")]), #upper high point
+                    _constraint(top, [(1, "psix")]), #upper high point maximum
+                    _constraint(outer, [(curv1, "psix"), (1, "psiyy")]), #curvature condition at outer equatorial point
+                    _constraint(inner, [(curv3, "psix"), (1, "psiyy")]), #curvature condition at inner equatorial point
+                    _constraint(top, [(curv2, "psiy"), (1, "psixx")]), #curvature condition at top
+                    _constraint(inner, [(1, "psix")])] #Equilibrium beta limit condition
+            R = np.stack(rows, axis=-2)
+            M = np.concatenate((R[..., 0:7], R[..., _p1:_p1+1] - R[..., _p2:_p2+1]), axis=-1)
+            b = -R[..., _p2]
+
+        case "asym_single_null":
+            rows = [_constraint(outer, [(1, "psi")]), #outer equatorial point
+                    _constraint(inner, [(1, "psi")]), #inner equatorial point
+                    _constraint(top, [(1, "psi")]), #upper high point
+                    _constraint(xpoint, [(1, "psi")]), #lower X point
+                    _constraint(outer, [(slope1, "psix"), (1, "psiy")]), #outer equatorial point slope
+                    _constraint(inner, [(slope2, "psix"), (1, "psiy")]), #inner equatorial point slope
+                    _constraint(top, [(1, "psix")]), #upper high point maximum
+                    _constraint(xpoint, [(1, "psix")]), #By = 0 at lower X-point
+                    _constraint(xpoint, [(1, "psiy")]), #Bx = 0 at lower X-point
+                    _constraint(outer, [(curv1, "psix"), (1, "psiyy")]), #curvature condition at outer equatorial point
+                    _constraint(inner, [(curv3, "psix"), (1, "psiyy")]), #curvature condition at inner equatorial point
+                    _constraint(top, [(curv2, "psiy"), (1, "psixx")])] #curvature condition at top
+            R = np.stack(rows, axis=-2)
+            M = R[..., 0:12]
+            b = -(A[..., np.newaxis]*R[..., _p1] + (1-A[..., np.newaxis])*R[..., _p2])
+
+        case _:
+            raise ValueError("unknown equilibrium type %r, expected one of %s" % (eq_type, ", ".join(eq_types)))
+
+    return M, b
+
+def solve_equilibrium(eq_type, epsilon, kappa, delta, A, xsep, ysep):
+    # Solve the linear system for the coefficients C of the general solution.
+    # Return C, of shape (...,n_homogeneous), with zeros for the up-down
+    # asymmetric terms of symmetric equilibria and for the additional
+    # homogeneous solutions (see generate_solutions.py), which are not
+    # constrained by the boundary conditions above, together with A (which
+    # is computed self-consistently at the equilibrium beta limit, and
+    # returned unchanged otherwise) and the vertical position ysep of the
+    # lower X point (or of the bottom of the plasma for symmetric equilibria).
+    M, b = assemble_system(eq_type, epsilon, kappa, delta, A, xsep, ysep)
+    solution = np.linalg.solve(M, b[..., np.newaxis])[..., 0]
+    shape = solution.shape[:-1]
+    A = np.broadcast_to(np.asarray(A, dtype=float), shape)
+    ysep = np.broadcast_to(np.asarray(ysep, dtype=float), shape)
+    if eq_type == "symmetric_beta_limit":
+        A = solution[..., 7]
+        solution = solution[..., 0:7]
+    C = np.concatenate((solution, np.zeros(shape + (n_homogeneous - solution.shape[-1],))), axis=-1)
+    if eq_type != "asym_single_null":
+        ysep = -np.broadcast_to(np.asarray(kappa, dtype=float)*epsilon, shape)
+    return C, A, ysep
+
+def solve_parameter_sets(eq_type, parameters, derived=True):
+    # Solve the parameter sets in the rows of parameters, of shape (N,6) with
+    # the columns of parameter_names, and return the values listed in
+    # value_names, of shape (N,len(value_names)): C, A, ysep and, if derived
+    # is True, the position of the magnetic axis and the value of psi there.
+    # Unlike solve_equilibrium, a singular system does not stop the whole
+    # batch: the rows for which the linear system is singular, or the
+    # magnetic axis is not found, are filled with NaN.
+    values = np.full((len(parameters), len(value_names)), np.nan)
+    try:
+        C, A, ysep = solve_equilibrium(eq_type, *parameters.T)
+        ok = np.ones(len(parameters), dtype=bool)
+    except np.linalg.LinAlgError:
+        C = np.full((len(parameters), n_homogeneous), np.nan)
+        A = np.full(len(parameters), np.nan)
+        ysep = np.full(len(parameters), np.nan)
+        ok = np.zeros(len(parameters), dtype=bool)
+        for i, p in enumerate(parameters):
+            try:
+                C[i], A[i], ysep[i] = solve_equilibrium(eq_type, *p)
+                ok[i] = True
+            except np.linalg.LinAlgError:
+                pass
+    values[:, :n_homogeneous] = C
+    values[:, n_homogeneous] = A
+    values[:, n_homogeneous+1] = ysep
+    if derived:
+        for i in np.flatnonzero(ok):
+            try:
+                values[i, n_homogeneous+2:] = magnetic_axis(C[i], A[i])
+            except (RuntimeError, np.linalg.LinAlgError):
+                pass
+    return values
@@ -0,0 +1,418 @@
+# In this file, we define a long-lived local service around the solver, so
+# that several tools can ask for equilibria concurrently without starting a
+# Python process (and importing matplotlib) for each of them.
+#
+# The service listens on a Unix socket (or on a TCP port of localhost) and
+# reads requests as JSON objects, one per line, for example
+#
+#   {"id": 1, "eq_type": "asym_single_null", "epsilon": 0.32, "kappa": 1.7,
+#    "delta": 0.33, "A": -0.155, "xsep": 0.88, "ysep": -0.6,
+#    "grid": {"x": [0.6, 1.4, 400], "y": [-0.7, 0.7, 700],
+#             "quantities": ["psi"], "dtype": "float32"}}
+#
+# where "id" is optional and echoed in the answer, and "grid" is optional and
+# requests the values of psi (or of its derivatives) on the grid of
+# np.linspace(*x) by np.linspace(*y) points. Each request is answered, in the
+# order in which the requests were sent on the connection, with one JSON line
+#
+#   {"id": 1, "C": [...], "A": ..., "ysep": ..., "cached": false,
+#    "grid": {"shape": [700, 400], "dtype": "<f4", "quantities": ["psi"]}}
+#
+# (or {"id": 1, "error": "..."}), followed, if a grid was requested, by binary
+# frames holding blocks of rows of the grid: each frame is a header of two
+# little-endian unsigned 64-bit integers, the index of the first row and the
+# number of rows, followed by the raw values of these rows in C order. A frame
+# with zero rows ends the grid. The request {"op": "stats"} returns counters
+# of the activity of the service.
+#
+# The parameters epsilon, kappa and delta are required for every equilibrium
+# type, A for all but symmetric_beta_limit (where it is computed), and xsep
+# and ysep for asym_single_null only. Requests with missing parameters, with
+# parameters which are not finite numbers, or whose grid holds more than
+# max_grid_values values, are answered with an error without being solved.
+#
+# Requests for the same equilibrium type which arrive within window seconds of
+# each other, from any connection, are gathered and solved together with a
+# single batched call to solve_equilibrium, so that the cost per equilibrium
+# decreases as the request rate increases. Solved equilibria are kept in a
+# cache of the cache_size most recently used parameter sets, and concurrent
+# requests for the same parameters share a single solve. Grids are evaluated
+# block by block in a thread, and each block is sent as soon as it is ready.
+#
+# The service is started with
+#
+#   python EquilibriumService.py --socket /tmp/solovev.sock
+#
+# and EquilibriumClient (or solve_remote, for synchronous code) sends requests
+# to it.
+
+import argparse
+import asyncio
+import collections
+import json
+import struct
+import numpy as np
+from Equilibrium import eq_types, parameter_names, unused_parameters, solve_equilibrium
+from PointEvaluation import evaluate_grid, quantity_names
+
+_frame_header = struct.Struct("<QQ")
+
+def _check_eq_type(eq_type):
+    if eq_type not in eq_types:
+        raise ValueError("unknown equilibrium type %r, expected one of %s" % (eq_type, ", ".join(eq_types)))
+
+def _cache_key(eq_type, parameters):
+    # Parameters which do not enter the solution are normalized, so that the
+    # requests which differ only by them share the same cache entry
+    values = dict(zip(parameter_names, (float(p) for p in parameters)))
+    for name in unused_parameters[eq_type]:
+        values[name] = 0.
+    return (eq_type,) + tuple(values[name] for name in parameter_names)
+
+################################################################################
+#
+#   Server
+#
+################################################################################
+
+class EquilibriumService:
+    # Batched and cached solver, and the handler of the connections of the
+    # clients
+
+    def __init__(self, window=0.002, max_batch=4096, cache_size=65536, rows_per_frame=None,
+                 frame_size=1 << 20, max_grid_values=1 << 25):
+        self.window = window
+        self.max_batch = max_batch
+        self.cache_size = cache_size
+        self.rows_per_frame = rows_per_frame
+        self.frame_size = frame_size
+        self.max_grid_values = max_grid_values
+        self.cache = collections.OrderedDict()
+        self.pending = {} # futures of the solves in progress, by cache key
+        self.queues = {eq_type: [] for eq_type in eq_types}
+        self.timers = {}
+        self.statistics = {"requests": 0, "cache_hits": 0, "solves": 0, "batches": 0, "errors": 0,
+                           "grid_bytes": 0}
+
+    ############################################################################
+    #   Solves
+    ############################################################################
+
+    async def solve(self, eq_type, parameters):
+        # Return C, A and ysep for the given equilibrium type and parameters
+        # (in the order of parameter_names), and whether they were cached
+        _check_eq_type(eq_type)
+        key = _cache_key(eq_type, parameters)
+        self.statistics["requests"] += 1
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            self.statistics["cache_hits"] += 1
+            return self.cache[key] + (True,)
+        if key not in self.pending:
+            self.pending[key] = asyncio.get_running_loop().create_future()
+            queue = self.queues[eq_type]
+            queue.append(key)
+            if len(queue) >= self.max_batch:
+                self._flush(eq_type)
+            elif eq_type not in self.timers:
+                self.timers[eq_type] = asyncio.get_running_loop().call_later(self.window, self._flush, eq_type)
+        result = await asyncio.shield(self.pending[key])
+        return result + (False,)
+
+    def _flush(self, eq_type):
+        # Start the batched solve of all the requests queued for eq_type
+        timer = self.timers.pop(eq_type, None)
+        if timer is not None:
+            timer.cancel()
+        keys, self.queues[eq_type] = self.queues[eq_type], []
+        if keys:
+            asyncio.get_running_loop().create_task(self._solve_batch(eq_type, keys))
+
+    async def _solve_batch(self, eq_type, keys):
+        parameters = np.array([key[1:] for key in keys])
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(None, self._solve_arrays, eq_type, parameters)
+        except Exception as error:
+            results = [error]*len(keys)
+        self.statistics["batches"] += 1
+        for key, result in zip(keys, results):
+            future = self.pending.pop(key)
+            if isinstance(result, Exception):
+                self.statistics["errors"] += 1
+                future.set_exception(result)
+                continue
+            self.statistics["solves"] += 1
+            self.cache[key] = result
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+            future.set_result(result)
+
+    @staticmethod
+    def _solve_arrays(eq_type, parameters):
+        # Solve all the parameter sets at once. If one of the systems is
+        # singular, the batch is solved again one parameter set at a time, so
+        # that the error is only reported for the faulty requests. Solutions
+        # which are not finite are reported as errors as well, so that they
+        # are neither cached nor sent.
+        try:
+            C, A, ysep = solve_equilibrium(eq_type, *parameters.T)
+            results = [(C[i], float(A[i]), float(ysep[i])) for i in range(len(parameters))]
+        except np.linalg.LinAlgError:
+            results = []
+            for p in parameters:
+                try:
+                    C, A, ysep = solve_equilibrium(eq_type, *p)
+                    results.append((C, float(A), float(ysep)))
+                except np.linalg.LinAlgError as error:
+                    results.append(ValueError("singular system for the parameters %s (%s)" % (p.tolist(), error)))
+        for i, result in enumerate(results):
+            if not isinstance(result, Exception) and not (np.all(np.isfinite(result[0])) and np.isfinite(result[1])):
+                results[i] = ValueError("no finite solution for the parameters %s" % parameters[i].tolist())
+        return results
+
+    ############################################################################
+    #   Connections
+    ############################################################################
+
+    async def handle(self, reader, writer):
+        # Read the requests of a connection as they arrive, and answer them in
+        # order. Each request is solved in its own task, so that the requests
+        # sent in a row on a single connection are batched together as well.
+        # When the service is shut down, the requests which are not answered
+        # yet are dropped.
+        answers = asyncio.Queue()
+        sender = asyncio.get_running_loop().create_task(self._send_answers(answers, writer))
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if line.strip():
+                    answers.put_nowait(asyncio.get_running_loop().create_task(self._answer(line)))
+            answers.put_nowait(None)
+            await sender
+        except asyncio.CancelledError:
+            sender.cancel()
+            while not answers.empty():
+                task = answers.get_nowait()
+                if task is not None:
+                    task.cancel()
+        finally:
+            writer.close()
+
+    async def _answer(self, line):
+        # Header of the answer to the request line, and the specification of
+        # the grid to send after it, if any
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get("id")
+            if request.get("op", "solve") == "stats":
+                return {"id": request_id, "stats": dict(self.statistics, cache_size=len(self.cache))}, None
+            eq_type = request.get("eq_type", "symmetric")
+            _check_eq_type(eq_type)
+            for name in parameter_names:
+                if name not in request and name not in unused_parameters[eq_type]:
+                    raise ValueError("missing parameter %s" % name)
+            parameters = [float(request.get(name, 0.)) for name in parameter_names]
+            for name, value in zip(parameter_names, parameters):
+                if not np.isfinite(value):
+                    raise ValueError("%s must be a finite number, got %r" % (name, value))
+            grid = request.get("grid")
+            if grid is not None:
+                grid = self._grid_specification(grid)
+            C, A, ysep, cached = await self.solve(eq_type, parameters)
+        except Exception as error:
+            return {"id": request_id, "error": "%s: %s" % (type(error).__name__, error)}, None
+        header = {"id": request_id, "C": C.tolist(), "A": A, "ysep": ysep, "cached": cached}
+        if grid is not None:
+            header["grid"] = {"shape": list(grid["shape"]), "dtype": grid["dtype"].str, "quantities": list(grid["quantities"])}
+            grid = dict(grid, C=C, A=A)
+        return header, grid
+
+    def _grid_specification(self, grid):
+        # The size of the grid is checked before any array is allocated
+        axes = []
+        for name in ("x", "y"):
+            start, stop, n = grid[name]
+            start, stop = float(start), float(stop)
+            if not (np.isfinite(start) and np.isfinite(stop)) or n != int(n) or n < 1:
+                raise ValueError("the grid %s must be [start, stop, number of points], with finite bounds" % name)
+            axes.append((start, stop, int(n)))
+        quantities = tuple(grid.get("quantities", ["psi"]))
+        for name in quantities:
+            if name not in quantity_names:
+                raise ValueError("unknown quantity %r" % name)
+        if axes[0][2]*axes[1][2]*len(quantities) > self.max_grid_values:
+            raise ValueError("the grid has more than %d values" % self.max_grid_values)
+        dtype = np.dtype(grid.get("dtype", "float64"))
+        if dtype not in (np.float32, np.float64):
+            raise ValueError("the grid must be of type float32 or float64")
+        x = np.linspace(*axes[0])
+        y = np.linspace(*axes[1])
+        shape = (len(y), len(x)) if len(quantities) == 1 else (len(y), len(x), len(quantities))
+        return {"x": x, "y": y, "quantities": quantities, "dtype": dtype, "shape": shape}
+
+    async def _send_answers(self, answers, writer):
+        # Once the client has gone away, the remaining requests are still
+        # awaited, so that their solves are completed and cached, but their
+        # answers are dropped and their grids are not evaluated
+        connected = True
+        while True:
+            task = await answers.get()
+            if task is None:
+                break
+            header, grid = await task
+            connected = connected and not writer.is_closing()
+            if not connected:
+                continue
+            try:
+                writer.write(json.dumps(header).encode() + b"\n")
+                if grid is not None:
+                    await self._send_grid(grid, writer)
+                await writer.drain()
+            except ConnectionError:
+                connected = False
+
+    async def _send_grid(self, grid, writer):
+        # Evaluate the grid by blocks of rows in a thread, and send each block
+        # while the next one is being evaluated
+        x, y = grid["x"], grid["y"]
+        row_bytes = len(x)*len(grid["quantities"])*grid["dtype"].itemsize
+        rows = self.rows_per_frame or max(self.frame_size//max(row_bytes, 1), 1)
+        loop = asyncio.get_running_loop()
+        evaluate = lambda start: evaluate_grid(grid["C"], grid["A"], x, y[start:start+rows], grid["quantities"],
+                                               dtype=grid["dtype"])
+        block = loop.run_in_executor(None, evaluate, 0)
+        for start in range(0, len(y), rows):
+            values = await block
+            if writer.is_closing():
+                raise ConnectionResetError("the client went away")
+            if start + rows < len(y):
+                block = loop.run_in_executor(None, evaluate, start + rows)
+            writer.write(_frame_header.pack(start, values.shape[0]))
+            writer.write(values.tobytes())
+            self.statistics["grid_bytes"] += values.nbytes
+            await writer.drain()
+        writer.write(_frame_header.pack(len(y), 0))
+
+async def serve(path=None, host="127.0.0.1", port=None, **options):
+    # Start the service on the Unix socket path, or on the TCP port of host,
+    # and return the asyncio server and the EquilibriumService instance
+    service = EquilibriumService(**options)
+    if path is not None:
+        server = await asyncio.start_unix_server(service.handle, path=path)
+    else:
+        server = await asyncio.start_server(service.handle, host=host, port=port)
+    return server, service
+
+################################################################################
+#
+#   Client
+#
+################################################################################
+
+class EquilibriumClient:
+    # Connection to the service. The requests of several tasks can be sent
+    # concurrently on the same connection: the answers arrive in the order of
+    # the requests, and are routed to the tasks which sent them.
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.waiting = collections.deque()
+        self.receiver = asyncio.get_running_loop().create_task(self._receive())
+
+    @classmethod
+    async def connect(cls, path=None, host="127.0.0.1", port=None):
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+        self.receiver.cancel()
+
+    async def request(self, request):
+        # Send the request (a dictionary, as described at the top of this
+        # file) and return the answer, with C as an array and the grid, if
+        # any, as an array of the shape given in the header
+        answer = asyncio.get_running_loop().create_future()
+        self.waiting.append(answer)
+        self.writer.write(json.dumps(request).encode() + b"\n")
+        await self.writer.drain()
+        return await answer
+
+    async def _receive(self):
+        try:
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    raise ConnectionError("the connection to the service was closed")
+                answer = self.waiting.popleft()
+                try:
+                    answer.set_result(await self._read_answer(json.loads(line)))
+                except RuntimeError as error:
+                    answer.set_exception(error)
+        except (ConnectionError, asyncio.IncompleteReadError) as error:
+            while self.waiting:
+                self.waiting.popleft().set_exception(ConnectionError(str(error)))
+
+    async def _read_answer(self, answer):
+        if "error" in answer:
+            raise RuntimeError(answer["error"])
+        if "C" in answer:
+            answer["C"] = np.array(answer["C"])
+        if "grid" in answer:
+            spec = answer["grid"]
+            grid = np.empty(spec["shape"], dtype=np.dtype(spec["dtype"]))
+            rows = grid.reshape(grid.shape[0], -1)
+            while True:
+                start, n = _frame_header.unpack(await self.reader.readexactly(_frame_header.size))
+                if n == 0:
+                    break
+                data = await self.reader.readexactly(n*rows.shape[1]*grid.itemsize)
+                rows[start:start+n] = np.frombuffer(data, dtype=grid.dtype).reshape(n, -1)
+            answer["grid"] = grid
+        return answer
+
+    async def solve(self, eq_type, epsilon, kappa, delta, A, xsep=0., ysep=0., grid=None):
+        request = {"eq_type": eq_type, "epsilon": epsilon, "kappa": kappa, "delta": delta, "A": A,
+                   "xsep": xsep, "ysep": ysep}
+        if grid is not None:
+            request["grid"] = grid
+        return await self.request(request)
+
+def solve_remote(eq_type, epsilon, kappa, delta, A, xsep=0., ysep=0., grid=None, path=None, host="127.0.0.1",
+                 port=None):
+    # Synchronous version of EquilibriumClient.solve, for a single request
+    async def run():
+        client = await EquilibriumClient.connect(path, host, port)
+        try:
+            return await client.solve(eq_type, epsilon, kappa, delta, A, xsep, ysep, grid)
+        finally:
+            await client.close()
+    return asyncio.run(run())
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local service solving Solov'ev equilibria")
+    parser.add_argument("--socket", help="path of the Unix socket")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765, help="TCP port, if no socket is given")
+    parser.add_argument("--window", type=float, default=0.002, help="time during which requests are gathered [s]")
+    parser.add_argument("--max-batch", type=int, default=4096)
+    parser.add_argument("--cache-size", type=int, default=65536)
+    parser.add_argument("--max-grid-values", type=int, default=1 << 25, help="largest number of values in a grid")
+    args = parser.parse_args()
+
+    async def main():
+        server, _ = await serve(args.socket, args.host, args.port, window=args.window,
+                                max_batch=args.max_batch, cache_size=args.cache_size,
+                                max_grid_values=args.max_grid_values)
+        async with server:
+            await server.serve_forever()
+    asyncio.run(main())
@@ -0,0 +1,686 @@
+# This file was generated by generate_solutions.py: edit that script rather
+# than this file.
+#
+# In this file, we define all the special solutions and the homogeneous solutions to the Grad-Shafranov equation as defined in A.J. Cerfon and J.P. Freidberg, “One size fits all” analytic solutions to the Grad–Shafranov equation, Physics of Plasmas 17, 032502 (2010)
+
+import numpy as np
+
+# Number of homogeneous solutions, psi1, ..., psi12
+n_homogeneous = 12
+
+# psi 1 and all its derivatives
+
+def psi1(x,y):
+   return 1
+
+def psi1x(x,y):
+   return 0
+
+def psi1y(x,y):
+   return 0
+
+def psi1xx(x,y):
+   return 0
+
+def psi1xy(x,y):
+   return 0
+
+def psi1yy(x,y):
+   return 0
+
+def psi1xxx(x,y):
+   return 0
+
+def psi1xxy(x,y):
+   return 0
+
+def psi1xyy(x,y):
+   return 0
+
+def psi1yyy(x,y):
+   return 0
+
+# psi 2 and all its derivatives
+
+def psi2(x,y):
+   return x**2
+
+def psi2x(x,y):
+   return 2*x
+
+def psi2y(x,y):
+   return 0
+
+def psi2xx(x,y):
+   return 2
+
+def psi2xy(x,y):
+   return 0
+
+def psi2yy(x,y):
+   return 0
+
+def psi2xxx(x,y):
+   return 0
+
+def psi2xxy(x,y):
+   return 0
+
+def psi2xyy(x,y):
+   return 0
+
+def psi2yyy(x,y):
+   return 0
+
+# psi 3 and all its derivatives
+
+def psi3(x,y):
+   return -x**2*np.log(x)+y**2
+
+def psi3x(x,y):
+   return -2*x*np.log(x)-x
+
+def psi3y(x,y):
+   return 2*y
+
+def psi3xx(x,y):
+   return -2*np.log(x)-3
+
+def psi3xy(x,y):
+   return 0
+
+def psi3yy(x,y):
+   return 2
+
+def psi3xxx(x,y):
+   return -2/x
+
+def psi3xxy(x,y):
+   return 0
+
+def psi3xyy(x,y):
+   return 0
+
+def psi3yyy(x,y):
+   return 0
+
+# psi 4 and all its derivatives
+
+def psi4(x,y):
+   return x**4-4*x**2*y**2
+
+def psi4x(x,y):
+   return 4*x**3-8*x*y**2
+
+def psi4y(x,y):
+   return -8*x**2*y
+
+def psi4xx(x,y):
+   return 12*x**2-8*y**2
+
+def psi4xy(x,y):
+   return -16*x*y
+
+def psi4yy(x,y):
+   return -8*x**2
+
+def psi4xxx(x,y):
+   return 24*x
+
+def psi4xxy(x,y):
+   return -16*y
+
+def psi4xyy(x,y):
+   return -16*x
+
+def psi4yyy(x,y):
+   return 0
+
+# psi 5 and all its derivatives
+
+def psi5(x,y):
+   return 3*x**4*np.log(x)-12*x**2*y**2*np.log(x)-9*x**2*y**2+2*y**4
+
+def psi5x(x,y):
+   return 12*x**3*np.log(x)+3*x**3-24*x*y**2*np.log(x)-30*x*y**2
+
+def psi5y(x,y):
+   return -24*x**2*y*np.log(x)-18*x**2*y+8*y**3
+
+def psi5xx(x,y):
+   return 36*x**2*np.log(x)+21*x**2-24*y**2*np.log(x)-54*y**2
+
+def psi5xy(x,y):
+   return -48*x*y*np.log(x)-60*x*y
+
+def psi5yy(x,y):
+   return -24*x**2*np.log(x)-18*x**2+24*y**2
+
+def psi5xxx(x,y):
+   return 72*x*np.log(x)+78*x-24*y**2/x
+
+def psi5xxy(x,y):
+   return -48*y*np.log(x)-108*y
+
+def psi5xyy(x,y):
+   return -48*x*np.log(x)-60*x
+
+def psi5yyy(x,y):
+   return 48*y
+
+# psi 6 and all its derivatives
+
+def psi6(x,y):
+   return x**6-12*x**4*y**2+8*x**2*y**4
+
+def psi6x(x,y):
+   return 6*x**5-48*x**3*y**2+16*x*y**4
+
+def psi6y(x,y):
+   return -24*x**4*y+32*x**2*y**3
+
+def psi6xx(x,y):
+   return 30*x**4-144*x**2*y**2+16*y**4
+
+def psi6xy(x,y):
+   return -96*x**3*y+64*x*y**3
+
+def psi6yy(x,y):
+   return -24*x**4+96*x**2*y**2
+
+def psi6xxx(x,y):
+   return 120*x**3-288*x*y**2
+
+def psi6xxy(x,y):
+   return -288*x**2*y+64*y**3
+
+def psi6xyy(x,y):
+   return -96*x**3+192*x*y**2
+
+def psi6yyy(x,y):
+   return 192*x**2*y
+
+# psi 7 and all its derivatives
+
+def psi7(x,y):
+   return -15*x**6*np.log(x)+180*x**4*y**2*np.log(x)+75*x**4*y**2-120*x**2*y**4*np.log(x)-140*x**2*y**4+8*y**6
+
+def psi7x(x,y):
+   return -90*x**5*np.log(x)-15*x**5+720*x**3*y**2*np.log(x)+480*x**3*y**2-240*x*y**4*np.log(x)-400*x*y**4
+
+def psi7y(x,y):
+   return 360*x**4*y*np.log(x)+150*x**4*y-480*x**2*y**3*np.log(x)-560*x**2*y**3+48*y**5
+
+def psi7xx(x,y):
+   return -450*x**4*np.log(x)-165*x**4+2160*x**2*y**2*np.log(x)+2160*x**2*y**2-240*y**4*np.log(x)-640*y**4
+
+def psi7xy(x,y):
+   return 1440*x**3*y*np.log(x)+960*x**3*y-960*x*y**3*np.log(x)-1600*x*y**3
+
+def psi7yy(x,y):
+   return 360*x**4*np.log(x)+150*x**4-1440*x**2*y**2*np.log(x)-1680*x**2*y**2+240*y**4
+
+def psi7xxx(x,y):
+   return -1800*x**3*np.log(x)-1110*x**3+4320*x*y**2*np.log(x)+6480*x*y**2-240*y**4/x
+
+def psi7xxy(x,y):
+   return 4320*x**2*y*np.log(x)+4320*x**2*y-960*y**3*np.log(x)-2560*y**3
+
+def psi7xyy(x,y):
+   return 1440*x**3*np.log(x)+960*x**3-2880*x*y**2*np.log(x)-4800*x*y**2
+
+def psi7yyy(x,y):
+   return -2880*x**2*y*np.log(x)-3360*x**2*y+960*y**3
+
+# psi 8 and all its derivatives
+
+def psi8(x,y):
+   return y
+
+def psi8x(x,y):
+   return 0
+
+def psi8y(x,y):
+   return 1
+
+def psi8xx(x,y):
+   return 0
+
+def psi8xy(x,y):
+   return 0
+
+def psi8yy(x,y):
+   return 0
+
+def psi8xxx(x,y):
+   return 0
+
+def psi8xxy(x,y):
+   return 0
+
+def psi8xyy(x,y):
+   return 0
+
+def psi8yyy(x,y):
+   return 0
+
+# psi 9 and all its derivatives
+
+def psi9(x,y):
+   return x**2*y
+
+def psi9x(x,y):
+   return 2*x*y
+
+def psi9y(x,y):
+   return x**2
+
+def psi9xx(x,y):
+   return 2*y
+
+def psi9xy(x,y):
+   return 2*x
+
+def psi9yy(x,y):
+   return 0
+
+def psi9xxx(x,y):
+   return 0
+
+def psi9xxy(x,y):
+   return 2
+
+def psi9xyy(x,y):
+   return 0
+
+def psi9yyy(x,y):
+   return 0
+
+# psi 10 and all its derivatives
+
+def psi10(x,y):
+   return -3*x**2*y*np.log(x)+y**3
+
+def psi10x(x,y):
+   return -6*x*y*np.log(x)-3*x*y
+
+def psi10y(x,y):
+   return -3*x**2*np.log(x)+3*y**2
+
+def psi10xx(x,y):
+   return -6*y*np.log(x)-9*y
+
+def psi10xy(x,y):
+   return -6*x*np.log(x)-3*x
+
+def psi10yy(x,y):
+   return 6*y
+
+def psi10xxx(x,y):
+   return -6*y/x
+
+def psi10xxy(x,y):
+   return -6*np.log(x)-9
+
+def psi10xyy(x,y):
+   return 0
+
+def psi10yyy(x,y):
+   return 6
+
+# psi 11 and all its derivatives
+
+def psi11(x,y):
+   return 3*x**4*y-4*x**2*y**3
+
+def psi11x(x,y):
+   return 12*x**3*y-8*x*y**3
+
+def psi11y(x,y):
+   return 3*x**4-12*x**2*y**2
+
+def psi11xx(x,y):
+   return 36*x**2*y-8*y**3
+
+def psi11xy(x,y):
+   return 12*x**3-24*x*y**2
+
+def psi11yy(x,y):
+   return -24*x**2*y
+
+def psi11xxx(x,y):
+   return 72*x*y
+
+def psi11xxy(x,y):
+   return 36*x**2-24*y**2
+
+def psi11xyy(x,y):
+   return -48*x*y
+
+def psi11yyy(x,y):
+   return -24*x**2
+
+# psi 12 and all its derivatives
+
+def psi12(x,y):
+   return 60*x**4*y*np.log(x)-45*x**4*y-80*x**2*y**3*np.log(x)+8*y**5
+
+def psi12x(x,y):
+   return 240*x**3*y*np.log(x)-120*x**3*y-160*x*y**3*np.log(x)-80*x*y**3
+
+def psi12y(x,y):
+   return 60*x**4*np.log(x)-45*x**4-240*x**2*y**2*np.log(x)+40*y**4
+
+def psi12xx(x,y):
+   return 720*x**2*y*np.log(x)-120*x**2*y-160*y**3*np.log(x)-240*y**3
+
+def psi12xy(x,y):
+   return 240*x**3*np.log(x)-120*x**3-480*x*y**2*np.log(x)-240*x*y**2
+
+def psi12yy(x,y):
+   return -480*x**2*y*np.log(x)+160*y**3
+
+def psi12xxx(x,y):
+   return 1440*x*y*np.log(x)+480*x*y-160*y**3/x
+
+def psi12xxy(x,y):
+   return 720*x**2*np.log(x)-120*x**2-480*y**2*np.log(x)-720*y**2
+
+def psi12xyy(x,y):
+   return -960*x*y*np.log(x)-480*x*y
+
+def psi12yyy(x,y):
+   return -480*x**2*np.log(x)+480*y**2
+
+# psipart 1 and all its derivatives
+
+def psipart1(x,y):
+   return x**2*np.log(x)/2
+
+def psipart1x(x,y):
+   return x*np.log(x)+x/2
+
+def psipart1y(x,y):
+   return 0
+
+def psipart1xx(x,y):
+   return np.log(x)+3/2
+
+def psipart1xy(x,y):
+   return 0
+
+def psipart1yy(x,y):
+   return 0
+
+def psipart1xxx(x,y):
+   return 1/x
+
+def psipart1xxy(x,y):
+   return 0
+
+def psipart1xyy(x,y):
+   return 0
+
+def psipart1yyy(x,y):
+   return 0
+
+# psipart 2 and all its derivatives
+
+def psipart2(x,y):
+   return x**4/8
+
+def psipart2x(x,y):
+   return x**3/2
+
+def psipart2y(x,y):
+   return 0
+
+def psipart2xx(x,y):
+   return 3*x**2/2
+
+def psipart2xy(x,y):
+   return 0
+
+def psipart2yy(x,y):
+   return 0
+
+def psipart2xxx(x,y):
+   return 3*x
+
+def psipart2xxy(x,y):
+   return 0
+
+def psipart2xyy(x,y):
+   return 0
+
+def psipart2yyy(x,y):
+   return 0
+
+# Tables of the solutions and of their derivatives. The homogeneous solutions
+# are listed in the order of their coefficients C[0], C[1], ..., and are
+# followed by the particular solutions psipart1 and psipart2, which are
+# multiplied by A and (1-A) respectively
+
+basis = {
+   "psi": [psi1,psi2,psi3,psi4,psi5,psi6,psi7,psi8,psi9,psi10,psi11,psi12,psipart1,psipart2],
+   "psix": [psi1x,psi2x,psi3x,psi4x,psi5x,psi6x,psi7x,psi8x,psi9x,psi10x,psi11x,psi12x,psipart1x,psipart2x],
+   "psiy": [psi1y,psi2y,psi3y,psi4y,psi5y,psi6y,psi7y,psi8y,psi9y,psi10y,psi11y,psi12y,psipart1y,psipart2y],
+   "psixx": [psi1xx,psi2xx,psi3xx,psi4xx,psi5xx,psi6xx,psi7xx,psi8xx,psi9xx,psi10xx,psi11xx,psi12xx,psipart1xx,psipart2xx],
+   "psixy": [psi1xy,psi2xy,psi3xy,psi4xy,psi5xy,psi6xy,psi7xy,psi8xy,psi9xy,psi10xy,psi11xy,psi12xy,psipart1xy,psipart2xy],
+   "psiyy": [psi1yy,psi2yy,psi3yy,psi4yy,psi5yy,psi6yy,psi7yy,psi8yy,psi9yy,psi10yy,psi11yy,psi12yy,psipart1yy,psipart2yy],
+   "psixxx": [psi1xxx,psi2xxx,psi3xxx,psi4xxx,psi5xxx,psi6xxx,psi7xxx,psi8xxx,psi9xxx,psi10xxx,psi11xxx,psi12xxx,psipart1xxx,psipart2xxx],
+   "psixxy": [psi1xxy,psi2xxy,psi3xxy,psi4xxy,psi5xxy,psi6xxy,psi7xxy,psi8xxy,psi9xxy,psi10xxy,psi11xxy,psi12xxy,psipart1xxy,psipart2xxy],
+   "psixyy": [psi1xyy,psi2xyy,psi3xyy,psi4xyy,psi5xyy,psi6xyy,psi7xyy,psi8xyy,psi9xyy,psi10xyy,psi11xyy,psi12xyy,psipart1xyy,psipart2xyy],
+   "psiyyy": [psi1yyy,psi2yyy,psi3yyy,psi4yyy,psi5yyy,psi6yyy,psi7yyy,psi8yyy,psi9yyy,psi10yyy,psi11yyy,psi12yyy,psipart1yyy,psipart2yyy],
+}
+
+# Fused kernels, evaluating the combination of all the functions in
+# basis[name] with the coefficients c: c[0]*psi1 + c[1]*psi2 + ...
+
+def combination_psi(c,x,y):
+   k0 = -15*c[6]
+   k1 = c[5]
+   k2 = 180*c[6]
+   k3 = -12*c[5]+75*c[6]
+   k4 = 60*c[11]
+   k5 = 3*c[10]-45*c[11]
+   k6 = 3*c[4]
+   k7 = c[13]/8+c[3]
+   k8 = -120*c[6]
+   k9 = 8*c[5]-140*c[6]
+   k10 = -80*c[11]
+   k11 = -4*c[10]
+   k12 = -12*c[4]
+   k13 = -4*c[3]-9*c[4]
+   k14 = -3*c[9]
+   k15 = c[8]
+   k16 = c[12]/2-c[2]
+   k17 = c[1]
+   k18 = 8*c[6]
+   k19 = 8*c[11]
+   k20 = 2*c[4]
+   k21 = c[9]
+   k22 = c[2]
+   k23 = c[7]
+   k24 = c[0]
+   lx = np.log(x)
+   x2 = x*x
+   return k24+lx*(x2*(k16+x2*(k0*x2+k6))+y*(x2*(k14+k4*x2)+y*(x2*(k12+k2*x2)+y*(k10*x2+k8*x2*y))))+x2*(k17+x2*(k1*x2+k7))+y*(k23+x2*(k15+k5*x2)+y*(k22+x2*(k13+k3*x2)+y*(k11*x2+k21+y*(k20+k9*x2+y*(k18*y+k19)))))
+
+def combination_psix(c,x,y):
+   k0 = -90*c[6]
+   k1 = 6*c[5]-15*c[6]
+   k2 = 720*c[6]
+   k3 = -48*c[5]+480*c[6]
+   k4 = 240*c[11]
+   k5 = 12*c[10]-120*c[11]
+   k6 = 12*c[4]
+   k7 = c[13]/2+4*c[3]+3*c[4]
+   k8 = -240*c[6]
+   k9 = 16*c[5]-400*c[6]
+   k10 = -160*c[11]
+   k11 = -8*c[10]-80*c[11]
+   k12 = -24*c[4]
+   k13 = -8*c[3]-30*c[4]
+   k14 = -6*c[9]
+   k15 = 2*c[8]-3*c[9]
+   k16 = c[12]-2*c[2]
+   k17 = 2*c[1]+c[12]/2-c[2]
+   lx = np.log(x)
+   x2 = x*x
+   return x*(k17+lx*(k16+x2*(k0*x2+k6)+y*(k14+k4*x2+y*(k12+k2*x2+y*(k10+k8*y))))+x2*(k1*x2+k7)+y*(k15+k5*x2+y*(k13+k3*x2+y*(k11+k9*y))))
+
+def combination_psiy(c,x,y):
+   k0 = 360*c[6]
+   k1 = -24*c[5]+150*c[6]
+   k2 = 60*c[11]
+   k3 = 3*c[10]-45*c[11]
+   k4 = -480*c[6]
+   k5 = 32*c[5]-560*c[6]
+   k6 = -240*c[11]
+   k7 = -12*c[10]
+   k8 = -24*c[4]
+   k9 = -8*c[3]-18*c[4]
+   k10 = -3*c[9]
+   k11 = c[8]
+   k12 = 48*c[6]
+   k13 = 40*c[11]
+   k14 = 8*c[4]
+   k15 = 3*c[9]
+   k16 = 2*c[2]
+   k17 = c[7]
+   lx = np.log(x)
+   x2 = x*x
+   return k17+lx*(x2*(k10+k2*x2)+y*(x2*(k0*x2+k8)+y*(k4*x2*y+k6*x2)))+x2*(k11+k3*x2)+y*(k16+x2*(k1*x2+k9)+y*(k15+k7*x2+y*(k14+k5*x2+y*(k12*y+k13))))
+
+def combination_psixx(c,x,y):
+   k0 = -450*c[6]
+   k1 = 30*c[5]-165*c[6]
+   k2 = 2160*c[6]
+   k3 = -144*c[5]+2160*c[6]
+   k4 = 720*c[11]
+   k5 = 36*c[10]-120*c[11]
+   k6 = 36*c[4]
+   k7 = 3*c[13]/2+12*c[3]+21*c[4]
+   k8 = -240*c[6]
+   k9 = 16*c[5]-640*c[6]
+   k10 = -160*c[11]
+   k11 = -8*c[10]-240*c[11]
+   k12 = -24*c[4]
+   k13 = -8*c[3]-54*c[4]
+   k14 = -6*c[9]
+   k15 = 2*c[8]-9*c[9]
+   k16 = c[12]-2*c[2]
+   k17 = 2*c[1]+3*c[12]/2-3*c[2]
+   lx = np.log(x)
+   x2 = x*x
+   return k17+lx*(k16+x2*(k0*x2+k6)+y*(k14+k4*x2+y*(k12+k2*x2+y*(k10+k8*y))))+x2*(k1*x2+k7)+y*(k15+k5*x2+y*(k13+k3*x2+y*(k11+k9*y)))
+
+def combination_psixy(c,x,y):
+   k0 = 1440*c[6]
+   k1 = -96*c[5]+960*c[6]
+   k2 = 240*c[11]
+   k3 = 12*c[10]-120*c[11]
+   k4 = -960*c[6]
+   k5 = 64*c[5]-1600*c[6]
+   k6 = -480*c[11]
+   k7 = -24*c[10]-240*c[11]
+   k8 = -48*c[4]
+   k9 = -16*c[3]-60*c[4]
+   k10 = -6*c[9]
+   k11 = 2*c[8]-3*c[9]
+   lx = np.log(x)
+   x2 = x*x
+   return x*(k11+k3*x2+lx*(k10+k2*x2+y*(k0*x2+k8+y*(k4*y+k6)))+y*(k1*x2+k9+y*(k5*y+k7)))
+
+def combination_psiyy(c,x,y):
+   k0 = 360*c[6]
+   k1 = -24*c[5]+150*c[6]
+   k2 = -1440*c[6]
+   k3 = 96*c[5]-1680*c[6]
+   k4 = -480*c[11]
+   k5 = -24*c[10]
+   k6 = -24*c[4]
+   k7 = -8*c[3]-18*c[4]
+   k8 = 240*c[6]
+   k9 = 160*c[11]
+   k10 = 24*c[4]
+   k11 = 6*c[9]
+   k12 = 2*c[2]
+   lx = np.log(x)
+   x2 = x*x
+   return k12+lx*(x2*(k0*x2+k6)+y*(k2*x2*y+k4*x2))+x2*(k1*x2+k7)+y*(k11+k5*x2+y*(k10+k3*x2+y*(k8*y+k9)))
+
+def combination_psixxx(c,x,y):
+   k0 = -1800*c[6]
+   k1 = 120*c[5]-1110*c[6]
+   k2 = 4320*c[6]
+   k3 = -288*c[5]+6480*c[6]
+   k4 = 1440*c[11]
+   k5 = 72*c[10]+480*c[11]
+   k6 = 72*c[4]
+   k7 = 3*c[13]+24*c[3]+78*c[4]
+   k8 = -240*c[6]
+   k9 = -160*c[11]
+   k10 = -24*c[4]
+   k11 = -6*c[9]
+   k12 = c[12]-2*c[2]
+   lx = np.log(x)
+   x2 = x*x
+   return (k12+lx*(x2*(k0*x2+k6)+y*(k2*x2*y+k4*x2))+x2*(k1*x2+k7)+y*(k11+k5*x2+y*(k10+k3*x2+y*(k8*y+k9))))/x
+
+def combination_psixxy(c,x,y):
+   k0 = 4320*c[6]
+   k1 = -288*c[5]+4320*c[6]
+   k2 = 720*c[11]
+   k3 = 36*c[10]-120*c[11]
+   k4 = -960*c[6]
+   k5 = 64*c[5]-2560*c[6]
+   k6 = -480*c[11]
+   k7 = -24*c[10]-720*c[11]
+   k8 = -48*c[4]
+   k9 = -16*c[3]-108*c[4]
+   k10 = -6*c[9]
+   k11 = 2*c[8]-9*c[9]
+   lx = np.log(x)
+   x2 = x*x
+   return k11+k3*x2+lx*(k10+k2*x2+y*(k0*x2+k8+y*(k4*y+k6)))+y*(k1*x2+k9+y*(k5*y+k7))
+
+def combination_psixyy(c,x,y):
+   k0 = 1440*c[6]
+   k1 = -96*c[5]+960*c[6]
+   k2 = -2880*c[6]
+   k3 = 192*c[5]-4800*c[6]
+   k4 = -960*c[11]
+   k5 = -48*c[10]-480*c[11]
+   k6 = -48*c[4]
+   k7 = -16*c[3]-60*c[4]
+   lx = np.log(x)
+   x2 = x*x
+   return x*(k1*x2+k7+lx*(k0*x2+k6+y*(k2*y+k4))+y*(k3*y+k5))
+
+def combination_psiyyy(c,x,y):
+   k0 = -2880*c[6]
+   k1 = 192*c[5]-3360*c[6]
+   k2 = -480*c[11]
+   k3 = -24*c[10]
+   k4 = 960*c[6]
+   k5 = 480*c[11]
+   k6 = 48*c[4]
+   k7 = 6*c[9]
+   lx = np.log(x)
+   x2 = x*x
+   return k3*x2+k7+lx*(k0*x2*y+k2*x2)+y*(k1*x2+k6+y*(k4*y+k5))
+
+combination = {
+   "psi": combination_psi,
+   "psix": combination_psix,
+   "psiy": combination_psiy,
+   "psixx": combination_psixx,
+   "psixy": combination_psixy,
+   "psiyy": combination_psiyy,
+   "psixxx": combination_psixxx,
+   "psixxy": combination_psixxy,
+   "psixyy": combination_psixyy,
+   "psiyyy": combination_psiyyy,
+}
@@ -0,0 +1,300 @@
+# In this file, we trace magnetic field lines and guiding-center orbits in a
+# solved equilibrium. Since psi and all its derivatives are known analytically
+# (see ExactSolutions.py), the magnetic field is evaluated exactly wherever it
+# is needed, without interpolating a gridded flux map.
+#
+# All quantities are normalized as in A.J. Cerfon and J.P. Freidberg, Physics
+# of Plasmas 17, 032502 (2010): lengths are normalized to the major radius R0
+# (x = R/R0, y = Z/R0) and the flux to psi0. The magnetic field is then
+#
+#   B = grad(psi) x grad(phi) + F(psi) grad(phi),   F(psi)**2 = F0**2 - 2*A*psi
+#
+# i.e. B_R = -psi_y/x, B_Z = psi_x/x, B_phi = F/x, where F0 = x*B_phi on the
+# plasma boundary psi = 0, and FF' = -A as in the Grad-Shafranov equation
+# solved in main.py.
+#
+# Many field lines or orbits are traced simultaneously: the state of all the
+# particles is stored in arrays and advanced together, each particle with its
+# own adaptive step size. Large sets of particles can in addition be split in
+# batches which are traced in parallel, by threads (NumPy releases the GIL in
+# the evaluation of the basis functions) or by processes.
+
+import os
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from PointEvaluation import evaluate_points
+
+################################################################################
+#
+#   Magnetic field
+#
+################################################################################
+
+def toroidal_field_function(A, F0, psi):
+    # F(psi), from FF' = -A and F = F0 on the boundary psi = 0. F is NaN where
+    # F**2 would be negative, far outside of the plasma.
+    with np.errstate(invalid="ignore"):
+        return np.sign(F0)*np.sqrt(F0**2 - 2*A*psi)
+
+def magnetic_field(C, A, F0, x, y):
+    # Cylindrical components (B_R, B_phi, B_Z) of the magnetic field at the
+    # points (x,y), each of shape (N,)
+    A = np.asarray(A, dtype=float).item()
+    psi, psix, psiy = evaluate_points(C, A, x, y, quantities=("psi", "psix", "psiy")).T
+    return -psiy/x, toroidal_field_function(A, F0, psi)/x, psix/x
+
+################################################################################
+#
+#   Equations of motion
+#
+################################################################################
+
+def _field_line_rhs(C, A, F0, phi, state):
+    # Field lines parametrized by the toroidal angle:
+    #   dx/dphi = x*B_R/B_phi = -x*psi_y/F,  dy/dphi = x*B_Z/B_phi = x*psi_x/F
+    x = state[:, 0]
+    y = state[:, 1]
+    psi, psix, psiy = evaluate_points(C, A, x, y, quantities=("psi", "psix", "psiy")).T
+    F = toroidal_field_function(A, F0, psi)
+    return np.column_stack((-x*psiy/F, x*psix/F))
+
+def _guiding_center_rhs(C, A, F0, rho, t, state):
+    # Guiding-center equations of motion (R.G. Littlejohn, J. Plasma Physics
+    # 29, 111 (1983)), with the state (x, phi, y, vpar, mu):
+    #
+    #   dX/dt = (vpar*Bstar + rho*mu*b x grad(B))/Bstar_par
+    #   dvpar/dt = -mu*Bstar.grad(B)/Bstar_par
+    #
+    # where Bstar = B + rho*vpar*curl(b) and Bstar_par = b.Bstar. Velocities
+    # are normalized to a reference velocity v0, time to R0/v0, and
+    # rho = m*v0/(q*B0*R0) is the normalized gyroradius, with B0 = psi0/R0**2.
+    # mu = vperp**2/(2*B) is conserved.
+    x = state[:, 0]
+    y = state[:, 2]
+    vpar = state[:, 3]
+    mu = state[:, 4]
+    psi, psix, psiy, psixx, psixy, psiyy = evaluate_points(C, A, x, y, quantities=("psi", "psix", "psiy", "psixx", "psixy", "psiyy")).T
+    F = toroidal_field_function(A, F0, psi)
+    dF = -A/F
+
+    # Field and its magnitude, in the cylindrical basis (R, phi, Z)
+    B = np.stack((-psiy/x, F/x, psix/x))
+    Bmod = np.sqrt(np.sum(B**2, axis=0))
+    b = B/Bmod
+
+    # Gradient of B, from B**2 = (psi_x**2+psi_y**2+F**2)/x**2 and FF' = -A
+    dB2dx = 2*(psix*psixx + psiy*psixy - A*psix)/x**2 - 2*Bmod**2/x
+    dB2dy = 2*(psix*psixy + psiy*psiyy - A*psiy)/x**2
+    gradB = np.stack((dB2dx, np.zeros_like(x), dB2dy))/(2*Bmod)
+
+    # curl(B) = F'*B_pol - Delta*(psi)/x e_phi, and
+    # curl(b) = (curl(B) + b x grad(B))/B
+    gs_operator = psixx - psix/x + psiyy
+    curlB = np.stack((dF*B[0], -gs_operator/x, dF*B[2]))
+    b_cross_gradB = np.cross(b, gradB, axis=0)
+    curlb = (curlB + b_cross_gradB)/Bmod
+
+    Bstar = B + rho*vpar*curlb
+    Bstar_par = np.sum(b*Bstar, axis=0)
+    V = (vpar*Bstar + rho*mu*b_cross_gradB)/Bstar_par
+    dvpar = -mu*np.sum(Bstar*gradB, axis=0)/Bstar_par
+
+    return np.column_stack((V[0], V[1]/x, V[2], dvpar, np.zeros_like(mu)))
+
+################################################################################
+#
+#   Integrators
+#
+################################################################################
+
+# Dormand-Prince 5(4) coefficients
+_dp_c = np.array([0, 1/5, 3/10, 4/5, 8/9, 1, 1])
+_dp_a = [[],
+         [1/5],
+         [3/40, 9/40],
+         [44/45, -56/15, 32/9],
+         [19372/6561, -25360/2187, 64448/6561, -212/729],
+         [9017/3168, -355/33, 46732/5247, 49/176, -5103/18656],
+         [35/384, 0, 500/1113, 125/192, -2187/6784, 11/84]]
+_dp_b = np.array([35/384, 0, 500/1113, 125/192, -2187/6784, 11/84, 0])
+_dp_e = _dp_b - np.array([5179/57600, 0, 7571/16695, 393/640, -92097/339200, 187/2100, 1/40])
+
+def _integrate_rk45(rhs, t0, state, t_out, rtol, atol, error_components, max_steps):
+    # Adaptive Dormand-Prince integration of dstate/dt = rhs(t,state), with an
+    # independent step size for each row of state. The solution is returned
+    # at the times t_out, in an array of shape (N,len(t_out),d). Particles for
+    # which the step size collapses, for example because they left the domain
+    # where the equilibrium is defined, are filled with NaN from then on.
+    n, d = state.shape
+    result = np.full((n, len(t_out), d), np.nan)
+    t = np.full(n, float(t0))
+    state = state.astype(float, copy=True)
+    h = np.full(n, (t_out[-1] - t0)/100)
+    h_min = 1e-12*max(abs(t_out[-1] - t0), 1)
+    next_out = np.zeros(n, dtype=int)
+    at_start = t_out[0] == t0
+    if at_start:
+        result[:, 0] = state
+        next_out[:] = 1
+    active = np.arange(n) if len(t_out) > int(at_start) else np.arange(0)
+
+    for _ in range(max_steps):
+        if active.size == 0:
+            break
+        ta = t[active]
+        ya = state[active]
+        target = t_out[next_out[active]]
+        ha = np.minimum(h[active], target - ta)
+        reaches = ha == target - ta
+
+        k = np.empty((7, active.size, d))
+        k[0] = rhs(ta, ya)
+        for i in range(1, 7):
+            increment = sum(a*k[j] for j, a in enumerate(_dp_a[i]) if a != 0)
+            k[i] = rhs(ta + _dp_c[i]*ha, ya + ha[:, np.newaxis]*increment)
+        y_new = ya + ha[:, np.newaxis]*np.tensordot(_dp_b, k, axes=1)
+        error = ha[:, np.newaxis]*np.tensordot(_dp_e, k, axes=1)
+
+        scale = atol + rtol*np.maximum(np.abs(ya), np.abs(y_new))
+        with np.errstate(invalid="ignore"):
+            error_norm = np.sqrt(np.mean((error/scale)[:, error_components]**2, axis=1))
+        finite = np.isfinite(error_norm) & np.all(np.isfinite(y_new), axis=1)
+        accept = finite & (error_norm <= 1)
+
+        # Step size control
+        with np.errstate(divide="ignore"):
+            factor = np.where(finite, np.clip(0.9*error_norm**-0.2, 0.2, 5.), 0.1)
+        h[active] = np.where(accept & reaches, np.maximum(h[active], ha*factor), ha*factor)
+
+        accepted = active[accept]
+        t[accepted] = ta[accept] + ha[accept]
+        state[accepted] = y_new[accept]
+        recorded = active[accept & reaches]
+        t[recorded] = t_out[next_out[recorded]]
+        result[recorded, next_out[recorded]] = state[recorded]
+        next_out[recorded] += 1
+
+        lost = h[active] < h_min
+        done = next_out[active] == len(t_out)
+        active = active[~(lost | done)]
+    else:
+        raise RuntimeError("maximum number of steps exceeded for %d particles" % active.size)
+    return result
+
+def _integrate_field_lines_midpoint(C, A, F0, state, phi_out, step, tol, max_iterations):
+    # Implicit midpoint rule for the field line equations, written in the
+    # canonical variables p = ln(x), q = y. In these variables the field line
+    # equations are Hamilton's equations, with the toroidal angle as time and
+    # the Hamiltonian H(psi) = integral of dpsi/F(psi):
+    #
+    #   dp/dphi = -psi_y/F = -dH/dq,  dq/dphi = x*psi_x/F = dH/dp
+    #
+    # so that the implicit midpoint rule is symplectic. It only conserves
+    # quadratic invariants exactly, and H (hence psi) is not one of them, but
+    # the error on H stays bounded, of order step**2, instead of drifting over
+    # long integrations as with rk45.
+    def rhs(z):
+        x = np.exp(z[:, 0])
+        psi, psix, psiy = evaluate_points(C, A, x, z[:, 1], quantities=("psi", "psix", "psiy")).T
+        F = toroidal_field_function(A, F0, psi)
+        return np.column_stack((-psiy/F, x*psix/F))
+
+    z = np.column_stack((np.log(state[:, 0]), state[:, 1]))
+    result = np.full((len(state), len(phi_out), 2), np.nan)
+    result[:, 0] = state
+    for i in range(1, len(phi_out)):
+        n_steps = max(int(np.ceil((phi_out[i] - phi_out[i-1])/step - 1e-9)), 1)
+        h = (phi_out[i] - phi_out[i-1])/n_steps
+        for _ in range(n_steps):
+            z_new = z + h*rhs(z)
+            converged = np.zeros(len(z), dtype=bool)
+            for _ in range(max_iterations):
+                z_next = z + h*rhs((z + z_new)/2)
+                with np.errstate(invalid="ignore"):
+                    converged = np.all(np.abs(z_next - z_new) <= tol, axis=1)
+                z_new = z_next
+                if np.all(converged | ~np.all(np.isfinite(z_new), axis=1)):
+                    break
+            # A step whose iterations did not converge is neither accurate
+            # nor symplectic, and the field line is lost from then on
+            z_new[~converged] = np.nan
+            z = z_new
+        result[:, i] = np.column_stack((np.exp(z[:, 0]), z[:, 1]))
+    return result
+
+def _trace_batch(kind, C, A, F0, rho, state, t0, t_out, method, options):
+    if kind == "field_line":
+        if method == "midpoint":
+            return _integrate_field_lines_midpoint(C, A, F0, state, t_out, options["step"], options["tol"], options["max_iterations"])
+        rhs = lambda t, s: _field_line_rhs(C, A, F0, t, s)
+        return _integrate_rk45(rhs, t0, state, t_out, options["rtol"], options["atol"], [0, 1], options["max_steps"])
+    rhs = lambda t, s: _guiding_center_rhs(C, A, F0, rho, t, s)
+    return _integrate_rk45(rhs, t0, state, t_out, options["rtol"], options["atol"], [0, 1, 2, 3], options["max_steps"])
+
+def _trace(kind, C, A, F0, rho, state, t0, t_out, method, options, workers, executor, batch_size):
+    C = np.asarray(C, dtype=float).ravel()
+    A = np.asarray(A, dtype=float).item()
+    t_out = np.asarray(t_out, dtype=float)
+    if t_out.ndim != 1 or np.any(np.diff(t_out) <= 0) or t_out[0] < t0:
+        raise ValueError("output times must be increasing, and not precede the initial time")
+    if method not in ("rk45", "midpoint") or (method == "midpoint" and kind != "field_line"):
+        raise ValueError("unknown integration method %r" % method)
+
+    n = len(state)
+    workers = os.cpu_count() if workers is None else workers
+    if batch_size is None:
+        batch_size = max(-(-n//workers), 1)
+    batches = [state[i:i+batch_size] for i in range(0, n, batch_size)]
+    if workers == 1 or len(batches) <= 1:
+        results = [_trace_batch(kind, C, A, F0, rho, s, t0, t_out, method, options) for s in batches]
+    else:
+        pool = {"thread": ThreadPoolExecutor, "process": ProcessPoolExecutor}[executor]
+        with pool(max_workers=workers) as ex:
+            futures = [ex.submit(_trace_batch, kind, C, A, F0, rho, s, t0, t_out, method, options) for s in batches]
+            results = [f.result() for f in futures]
+    return np.concatenate(results) if results else np.empty((0, len(t_out), state.shape[1]))
+
+################################################################################
+#
+#   Field lines and guiding-center orbits
+#
+################################################################################
+
+def trace_field_lines(C, A, F0, x0, y0, phi_out, method="rk45", rtol=1e-9, atol=1e-12, step=0.01,
+                      tol=1e-13, max_iterations=50, max_steps=1000000, workers=1, executor="thread", batch_size=None):
+    # Trace the field lines starting at the points (x0,y0) in the plane
+    # phi = phi_out[0], and return their positions x and y, of shape
+    # (N,len(phi_out)), at the toroidal angles phi_out.
+    #
+    # method is either "rk45" (adaptive Dormand-Prince, with tolerances rtol
+    # and atol) or "midpoint" (symplectic implicit midpoint rule with a fixed
+    # step in phi, the nonlinear iterations being converged to tol), which is
+    # the method of choice for long integrations such as Poincare plots. The
+    # field lines which leave the domain where the equilibrium is defined, or
+    # for which the nonlinear iterations do not converge to tol within
+    # max_iterations, are filled with NaN from then on.
+    #
+    # workers > 1 splits the field lines in batches of batch_size lines (by
+    # default, one batch per worker) which are traced in parallel, with
+    # executor = "thread" or "process". workers = None uses all the available
+    # cores.
+    state = np.column_stack((np.ravel(x0), np.ravel(y0))).astype(float)
+    phi_out = np.asarray(phi_out, dtype=float)
+    options = {"rtol": rtol, "atol": atol, "step": step, "tol": tol, "max_iterations": max_iterations, "max_steps": max_steps}
+    result = _trace("field_line", C, A, F0, None, state, phi_out[0], phi_out, method, options, workers, executor, batch_size)
+    return result[:, :, 0], result[:, :, 1]
+
+def trace_guiding_centers(C, A, F0, rho, x0, phi0, y0, vpar0, mu, t_out, rtol=1e-9, atol=1e-12,
+                          max_steps=1000000, workers=1, executor="thread", batch_size=None):
+    # Trace guiding-center orbits from the positions (x0,phi0,y0) with the
+    # parallel velocities vpar0 and magnetic moments mu (see
+    # _guiding_center_rhs for the normalization), and return x, phi, y and
+    # vpar, each of shape (N,len(t_out)), at the times t_out. The initial time
+    # is t_out[0]. Lost orbits are filled with NaN. The options controlling
+    # the accuracy and the parallelism are as in trace_field_lines.
+    x0, phi0, y0, vpar0, mu = np.broadcast_arrays(*[np.ravel(v) for v in (x0, phi0, y0, vpar0, mu)])
+    state = np.column_stack((x0, phi0, y0, vpar0, mu)).astype(float)
+    t_out = np.asarray(t_out, dtype=float)
+    options = {"rtol": rtol, "atol": atol, "max_steps": max_steps}
+    result = _trace("guiding_center", C, A, F0, rho, state, t_out[0], t_out, "rk45", options, workers, executor, batch_size)
+    return result[:, :, 0], result[:, :, 1], result[:, :, 2], result[:, :, 3]
@@ -0,0 +1,248 @@
+# In this file, we compute the magnetic axis, the flux surfaces and flux
+# surface averaged quantities of a solved equilibrium, in the normalized units
+# of main.py (x = R/R0, y = Z/R0, psi = 0 on the plasma boundary).
+#
+# The flux surfaces are parametrized by the poloidal angle theta around the
+# magnetic axis: on each ray leaving the axis, psi increases monotonically up to
+# the boundary, and the point where psi reaches a given value is found by a
+# safeguarded Newton iteration using the exact derivative of psi along the ray.
+# All the surfaces and all the rays are computed at once. Contour integrals
+# are then computed with the trapezoidal rule in theta, which converges
+# spectrally for these smooth periodic integrands, using
+#
+#   dl/|grad(psi)| = r*dtheta/|dpsi/dr|
+#
+# where r is the distance to the axis.
+
+import numpy as np
+from PointEvaluation import evaluate_points
+from FieldLineTracer import toroidal_field_function
+
+################################################################################
+#
+#   Magnetic axis
+#
+################################################################################
+
+def magnetic_axis(C, A, x0=1., y0=0., tol=1e-13, max_iterations=50):
+    # Newton iteration for grad(psi) = 0, starting from (x0,y0). Return the
+    # position (x,y) of the magnetic axis and the value of psi there.
+    z = np.array([x0, y0], dtype=float)
+    for _ in range(max_iterations):
+        psix, psiy, psixx, psixy, psiyy = evaluate_points(C, A, z[np.newaxis], quantities=("psix", "psiy", "psixx", "psixy", "psiyy"))[0]
+        step = np.linalg.solve([[psixx, psixy], [psixy, psiyy]], [psix, psiy])
+        z = z - step
+        if np.max(np.abs(step)) < tol:
+            break
+    else:
+        raise RuntimeError("the Newton iteration for the magnetic axis did not converge")
+    psi = evaluate_points(C, A, z[np.newaxis])[0, 0]
+    return z[0], z[1], psi
+
+################################################################################
+#
+#   Points on the rays leaving the magnetic axis
+#
+################################################################################
+
+def _psi_on_rays(C, A, axis, cos, sin, r, quantities=("psi", "psix", "psiy")):
+    x = axis[0] + r*cos
+    y = axis[1] + r*sin
+    values = evaluate_points(C, A, x.ravel(), y.ravel(), quantities=quantities)
+    return x, y, [v.reshape(r.shape) for v in values.T]
+
+def boundary_radius(C, A, axis, theta, r_max=2., n_march=400, n_bisection=50):
+    # Distance r_b(theta) from the magnetic axis to the boundary psi = 0 along
+    # the rays of angle theta. Each ray is first sampled with n_march points,
+    # to bracket the first point where psi >= 0. Rays which graze a
+    # separatrix near its X point, on which psi reaches a local maximum
+    # without crossing 0, stop at that maximum. The brackets are then refined
+    # by bisection.
+    theta = np.asarray(theta, dtype=float)
+    cos = np.cos(theta)[:, np.newaxis]
+    sin = np.sin(theta)[:, np.newaxis]
+    r = np.linspace(0, r_max, n_march + 1)[1:][np.newaxis, :]
+    # Stay on the side x > 0, where the solutions are defined
+    r = np.where(axis[0] + r*cos > 0, r, np.nan)
+    with np.errstate(invalid="ignore"):
+        _, _, (psi, psix, psiy) = _psi_on_rays(C, A, axis, cos, sin, np.nan_to_num(r, nan=0.))
+        psi = np.where(np.isnan(r), np.nan, psi)
+        dpsi = psix*cos + psiy*sin
+        crossing = psi >= 0
+        maximum = np.zeros_like(crossing)
+        maximum[:, :-1] = (dpsi[:, :-1] > 0) & (dpsi[:, 1:] <= 0)
+    stop = crossing | maximum
+    found = np.any(stop, axis=1)
+    if not np.all(found):
+        raise RuntimeError("the boundary psi = 0 was not found on %d rays" % np.sum(~found))
+    i = np.argmax(stop, axis=1)
+    rows = np.arange(len(theta))
+    is_crossing = crossing[rows, i]
+    # For a crossing the bracket is [r[i-1], r[i]], for a maximum the sign
+    # change of dpsi/dr is between r[i] and r[i+1]
+    lo = np.where(is_crossing, np.where(i > 0, r[0, np.maximum(i-1, 0)], 0.), r[0, i])
+    hi = np.where(is_crossing, r[0, i], r[0, np.minimum(i+1, r.shape[1]-1)])
+
+    cos = cos[:, 0]
+    sin = sin[:, 0]
+    for _ in range(n_bisection):
+        mid = (lo + hi)/2
+        _, _, (psi, psix, psiy) = _psi_on_rays(C, A, axis, cos, sin, mid)
+        inside = np.where(is_crossing, psi < 0, psix*cos + psiy*sin > 0)
+        lo = np.where(inside, mid, lo)
+        hi = np.where(inside, hi, mid)
+    return (lo + hi)/2
+
+def boundary_stationary_point(C, A, axis=None, r_b=None, n_theta=256, tol=1e-8, n_candidates=3, max_iterations=200):
+    # Point of the boundary where grad(psi) = 0, such as the X point of a
+    # diverted equilibrium or the inboard midplane at the equilibrium beta
+    # limit, or None if there is none. Newton iterations for grad(psi) = 0
+    # start from the n_candidates local minima of the poloidal field
+    # |grad(psi)|/x along the boundary, sampled on n_theta rays, with steps
+    # limited to the distance between neighbouring rays so that they stay
+    # close to the boundary. The Hessian of psi is singular at the beta
+    # limit, where the convergence is only linear. A point where they
+    # converge is on the boundary if psi vanishes there, to within tol times
+    # psi on the axis. r_b are the distances to the boundary along the
+    # n_theta rays, if they are already known.
+    if axis is None:
+        axis = magnetic_axis(C, A)
+    theta = 2*np.pi*np.arange(n_theta)/n_theta
+    if r_b is None:
+        r_b = boundary_radius(C, A, axis, theta)
+    x, y, (psix, psiy) = _psi_on_rays(C, A, axis, np.cos(theta), np.sin(theta), r_b, quantities=("psix", "psiy"))
+    field = np.hypot(psix, psiy)/x
+    minima = np.flatnonzero((field <= np.roll(field, 1)) & (field <= np.roll(field, -1)))
+    step_max = 2*np.pi/n_theta*np.max(r_b)
+    for k in minima[np.argsort(field[minima])][:n_candidates]:
+        start = np.array([x[k], y[k]])
+        z = start.copy()
+        for _ in range(max_iterations):
+            psix, psiy, psixx, psixy, psiyy = evaluate_points(C, A, z[np.newaxis], quantities=("psix", "psiy", "psixx", "psixy", "psiyy"))[0]
+            try:
+                step = np.linalg.solve([[psixx, psixy], [psixy, psiyy]], [psix, psiy])
+            except np.linalg.LinAlgError:
+                break
+            length = np.hypot(*step)
+            if length < 1e-13:
+                break
+            z = z - step*min(1, step_max/length)
+        psi = evaluate_points(C, A, z[np.newaxis])[0, 0]
+        if np.abs(psi) <= tol*np.abs(axis[2]) and np.hypot(*(z - start)) <= 2*step_max:
+            return z[0], z[1]
+    return None
+
+def _surface_radius(C, A, axis, cos, sin, target, r_b, tol=1e-12, max_iterations=60):
+    # Distance r from the axis to the point where psi = target on each ray,
+    # with 0 <= r <= r_b. The arrays cos, sin, target and r_b are broadcast
+    # against each other. Only the points which have not converged yet are
+    # updated at each iteration.
+    shape = np.broadcast(cos, sin, target, r_b).shape
+    cos, sin, target, r_b = [np.ravel(v) for v in np.broadcast_arrays(cos, sin, target, r_b)]
+    lo = np.zeros(r_b.shape)
+    hi = r_b.copy()
+    # psi varies quadratically with r close to the axis
+    r = r_b*np.sqrt(np.clip(1 - target/axis[2], 0, 1))
+    active = np.arange(r.size)
+    for _ in range(max_iterations):
+        ra = r[active]
+        _, _, (psi, psix, psiy) = _psi_on_rays(C, A, axis, cos[active], sin[active], ra)
+        residual = psi - target[active]
+        lo[active] = np.where(residual < 0, ra, lo[active])
+        hi[active] = np.where(residual < 0, hi[active], ra)
+        dpsi = psix*cos[active] + psiy*sin[active]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            r_new = ra - residual/dpsi
+        # Bisection step whenever the Newton step leaves the bracket
+        r_new = np.where((r_new > lo[active]) & (r_new < hi[active]), r_new, (lo[active] + hi[active])/2)
+        r[active] = r_new
+        active = active[np.abs(r_new - ra) >= tol*r_b[active]]
+        if active.size == 0:
+            break
+    return r.reshape(shape)
+
+def flux_surface_geometry(C, A, psi_n, n_theta=256, axis=None, r_b=None):
+    # Points on the flux surfaces psi_n = (psi - psi_axis)/(0 - psi_axis),
+    # for 0 < psi_n <= 1, at n_theta equally spaced poloidal angles. Return a
+    # dictionary with the coordinates x and y, the distance r to the axis and
+    # dpsi/dr, all of shape (len(psi_n),n_theta), as well as theta, the
+    # distance r_b to the boundary and the axis (x,y,psi). The axis and r_b
+    # can be passed when they are already known.
+    if axis is None:
+        axis = magnetic_axis(C, A)
+    psi_n = np.atleast_1d(np.asarray(psi_n, dtype=float))
+    theta = 2*np.pi*np.arange(n_theta)/n_theta
+    if r_b is None:
+        r_b = boundary_radius(C, A, axis, theta)
+    cos = np.cos(theta)[np.newaxis, :]
+    sin = np.sin(theta)[np.newaxis, :]
+    # On the boundary itself, use the radius found when bracketing it
+    r = np.broadcast_to(r_b, (len(psi_n), n_theta)).copy()
+    interior = psi_n < 1
+    if np.any(interior):
+        target = (axis[2]*(1 - psi_n[interior]))[:, np.newaxis]
+        r[interior] = _surface_radius(C, A, axis, cos, sin, target, r_b[np.newaxis, :])
+    x, y, (psix, psiy) = _psi_on_rays(C, A, axis, cos, sin, r, quantities=("psix", "psiy"))
+    return {"x": x, "y": y, "r": r, "dpsi_dr": psix*cos + psiy*sin, "theta": theta, "r_b": r_b, "axis": axis}
+
+def flux_surfaces(C, A, psi_n, n_theta=256, axis=None, r_b=None):
+    # Coordinates x and y of the points on the flux surfaces psi_n, each of
+    # shape (len(psi_n),n_theta)
+    geometry = flux_surface_geometry(C, A, psi_n, n_theta, axis, r_b)
+    return geometry["x"], geometry["y"]
+
+################################################################################
+#
+#   Flux surface averages and profiles
+#
+################################################################################
+
+def flux_surface_average(C, A, f, psi_n, n_theta=256, axis=None, r_b=None):
+    # Flux surface average <f> = contour integral of f*dl/B_p divided by the
+    # contour integral of dl/B_p, where f(x,y) is a vectorized function and
+    # dl/B_p = x*dl/|grad(psi)| = x*r*dtheta/|dpsi/dr|
+    g = flux_surface_geometry(C, A, psi_n, n_theta, axis, r_b)
+    weight = g["x"]*g["r"]/np.abs(g["dpsi_dr"])
+    return np.sum(f(g["x"], g["y"])*weight, axis=1)/np.sum(weight, axis=1)
+
+def safety_factor(C, A, F0, psi_n, n_theta=256, axis=None, r_b=None):
+    # Safety factor q = F/(2*pi) * contour integral of dl/(x*|grad(psi)|),
+    # with F(psi) as in FieldLineTracer.py. On the axis, where the flux
+    # surfaces degenerate, q = F/(x*sqrt(det(Hessian(psi)))). When the
+    # boundary has a point where grad(psi) = 0 (see boundary_stationary_point),
+    # which is the case for diverted equilibria and at the equilibrium beta
+    # limit, q diverges on the boundary psi_n = 1, and the value returned
+    # there is only finite because of the discretization. It must not be
+    # used.
+    A = np.asarray(A, dtype=float).item()
+    if axis is None:
+        axis = magnetic_axis(C, A)
+    psi_n = np.atleast_1d(np.asarray(psi_n, dtype=float))
+    q = np.empty(psi_n.shape)
+    on_axis = psi_n <= 0
+    if np.any(on_axis):
+        psixx, psixy, psiyy = evaluate_points(C, A, np.array([axis[:2]]), quantities=("psixx", "psixy", "psiyy"))[0]
+        F = toroidal_field_function(A, F0, axis[2])
+        q[on_axis] = F/(axis[0]*np.sqrt(psixx*psiyy - psixy**2))
+    if np.any(~on_axis):
+        g = flux_surface_geometry(C, A, psi_n[~on_axis], n_theta, axis, r_b)
+        F = toroidal_field_function(A, F0, axis[2]*(1 - psi_n[~on_axis]))
+        q[~on_axis] = F*np.mean(g["r"]/(g["x"]*np.abs(g["dpsi_dr"])), axis=1)
+    return q
+
+def current_integral(C, A, n_theta=256, n_r=32, axis=None, r_b=None):
+    # Integral of Delta*(psi)/x = (A + (1-A)*x**2)/x over the poloidal cross
+    # section of the plasma, computed with Gauss-Legendre quadrature in r and
+    # the trapezoidal rule in theta. The toroidal plasma current is
+    # -psi0/(mu0*R0) times this integral.
+    A = np.asarray(A, dtype=float).item()
+    if axis is None:
+        axis = magnetic_axis(C, A)
+    theta = 2*np.pi*np.arange(n_theta)/n_theta
+    if r_b is None:
+        r_b = boundary_radius(C, A, axis, theta)
+    nodes, weights = np.polynomial.legendre.leggauss(n_r)
+    r = r_b[:, np.newaxis]*(nodes[np.newaxis, :] + 1)/2
+    x = axis[0] + r*np.cos(theta)[:, np.newaxis]
+    integrand = (A + (1-A)*x**2)/x*r
+    return 2*np.pi/n_theta*np.sum(r_b/2*np.sum(weights*integrand, axis=1))
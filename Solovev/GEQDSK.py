@@ -0,0 +1,184 @@
+# In this file, we write solved equilibria in the GEQDSK format (EFIT g-file)
+# read by most stability and transport codes.
+#
+# The normalized solution psi_bar of main.py, for which
+#
+#   B = grad(psi) x grad(phi) + F grad(phi),   psi = psi0*psi_bar
+#
+# in physical units, is converted with the major radius R0 [m], the vacuum
+# toroidal field B0 [T] at R = R0, which sets F = R0*B0 on the plasma
+# boundary, and the flux normalization psi0 [Wb/rad]. Instead of psi0, the
+# toroidal plasma current can be specified, from which psi0 is deduced; the
+# plasma current has the sign of -psi0.
+#
+# The files follow the COCOS 1 convention of EFIT (O. Sauter and S.Yu.
+# Medvedev, Computer Physics Communications 184, 293 (2013)): (R,phi,Z) is
+# right-handed, B = F grad(phi) + grad(phi) x grad(psi_file) with psi_file in
+# Wb/rad, and q has the sign of Ip*B0. Hence psi_file = -psi0*psi_bar, which
+# increases from the magnetic axis to the boundary, where it vanishes, for a
+# positive current, and
+#
+#   p' = (1-A)*psi0/(mu0*R0**4),   FF' = A*psi0/R0**2
+#
+# as derivatives with respect to psi_file, so that p' and FF' are constant for
+# Solov'ev equilibria, and A controls how the plasma current is split between
+# the two.
+#
+# When the boundary has a point where grad(psi) = 0 (the X point of diverted
+# equilibria, or the inboard midplane at the equilibrium beta limit), q
+# diverges on the boundary. The q profile is then computed up to
+# psi_n = q_edge only, and held constant beyond.
+#
+# The flux map is evaluated and written one row at a time, so that only a few
+# arrays of size nw are held in memory. write_geqdsk_scan solves all the
+# equilibria of a parameter scan at once, and then writes the g-files one
+# after the other.
+
+import os
+import sys
+import numpy as np
+from Equilibrium import solve_parameter_sets
+from ExactSolutions import n_homogeneous
+from PointEvaluation import evaluate_points
+from FluxSurfaces import magnetic_axis, boundary_radius, boundary_stationary_point, flux_surfaces, safety_factor, current_integral
+from FieldLineTracer import toroidal_field_function
+
+mu0 = 4e-7*np.pi
+
+class _FortranWriter:
+    # Write numbers with the Fortran format (5e16.9) used in g-files. Arrays
+    # passed in several calls to write are continued on the same lines, and
+    # end_array starts a new line.
+
+    def __init__(self, file):
+        self.file = file
+        self.count = 0
+
+    def write(self, values):
+        for value in np.ravel(values):
+            self.file.write("%16.9e" % value)
+            self.count += 1
+            if self.count == 5:
+                self.file.write("\n")
+                self.count = 0
+
+    def end_array(self):
+        if self.count:
+            self.file.write("\n")
+            self.count = 0
+
+def write_geqdsk(file, C, A, R0, B0, psi0=None, current=None, nw=129, nh=129, n_boundary=256,
+                 margin=0.1, q_edge=0.995, description="Solov'ev equilibrium"):
+    # Write the equilibrium with coefficients C and A in the GEQDSK format, to
+    # file (a path or an open text file). Exactly one of psi0 and current
+    # [A] must be given. The grid of nw x nh points covers the plasma with a
+    # margin given as a fraction of the plasma size, and the limiter is the
+    # rectangle halfway between the plasma and the edge of the grid. q_edge
+    # is only used if the boundary has a stationary point (see above).
+    if (psi0 is None) == (current is None):
+        raise ValueError("exactly one of psi0 and current must be given")
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, "w") as f:
+            return write_geqdsk(f, C, A, R0, B0, psi0, current, nw, nh, n_boundary, margin, q_edge, description)
+    C = np.asarray(C, dtype=float).ravel()
+    A = np.asarray(A, dtype=float).item()
+    axis = magnetic_axis(C, A)
+    r_b = boundary_radius(C, A, axis, 2*np.pi*np.arange(n_boundary)/n_boundary)
+    if psi0 is None:
+        psi0 = -mu0*R0*current/current_integral(C, A, n_boundary, axis=axis, r_b=r_b)
+    else:
+        current = -psi0/(mu0*R0)*current_integral(C, A, n_boundary, axis=axis, r_b=r_b)
+    F0 = R0**2*B0/psi0 # normalized F on the boundary
+
+    # Boundary, and grid enclosing it
+    xb, yb = flux_surfaces(C, A, [1.], n_boundary, axis, r_b)
+    xb = np.append(xb[0], xb[0, 0])
+    yb = np.append(yb[0], yb[0, 0])
+    width = xb.max() - xb.min()
+    height = yb.max() - yb.min()
+    xmin = max(xb.min() - margin*width, 1e-3*xb.min())
+    xmax = xb.max() + margin*width
+    ymin = yb.min() - margin*height
+    ymax = yb.max() + margin*height
+    limiter_x = (xb.min() + xmin)/2, (xb.max() + xmax)/2
+    limiter_y = (yb.min() + ymin)/2, (yb.max() + ymax)/2
+    xlim = np.array([limiter_x[0], limiter_x[1], limiter_x[1], limiter_x[0], limiter_x[0]])
+    ylim = np.array([limiter_y[0], limiter_y[0], limiter_y[1], limiter_y[1], limiter_y[0]])
+
+    # Profiles on nw equally spaced values of psi, from the axis to the
+    # boundary. safety_factor returns q for the normalized F0, whose sign is
+    # that of B0*psi0, that is of -Ip*B0.
+    psi_n = np.linspace(0, 1, nw)
+    psi_bar = axis[2]*(1 - psi_n)
+    fpol = R0*B0/F0*toroidal_field_function(A, F0, psi_bar)
+    pres = -(1-A)*psi0**2/(mu0*R0**4)*psi_bar
+    ffprim = np.full(nw, A*psi0/R0**2)
+    pprime = np.full(nw, (1-A)*psi0/(mu0*R0**4))
+    if boundary_stationary_point(C, A, axis, r_b, n_boundary) is not None:
+        psi_n = np.minimum(psi_n, q_edge)
+    qpsi = -safety_factor(C, A, F0, psi_n, n_boundary, axis, r_b)
+
+    simag = -psi0*axis[2]
+    sibry = 0.
+    rmaxis = R0*axis[0]
+    zmaxis = R0*axis[1]
+    x = np.linspace(xmin, xmax, nw)
+    y = np.linspace(ymin, ymax, nh)
+
+    file.write("%-48s%4d%4d%4d\n" % (description[:48], 0, nw, nh))
+    out = _FortranWriter(file)
+    out.write([R0*(xmax - xmin), R0*(ymax - ymin), R0, R0*xmin, R0*(ymin + ymax)/2])
+    out.write([rmaxis, zmaxis, simag, sibry, B0])
+    out.write([current, simag, 0., rmaxis, 0.])
+    out.write([zmaxis, 0., sibry, 0., 0.])
+    for profile in (fpol, pres, ffprim, pprime):
+        out.write(profile)
+        out.end_array()
+    row = np.empty(nw)
+    for yj in y:
+        evaluate_points(C, A, x, np.full(nw, yj), out=row)
+        out.write(-psi0*row)
+    out.end_array()
+    out.write(qpsi)
+    out.end_array()
+    file.write("%5d%5d\n" % (len(xb), len(xlim)))
+    out.write(np.column_stack((R0*xb, R0*yb)))
+    out.end_array()
+    out.write(np.column_stack((R0*xlim, R0*ylim)))
+    out.end_array()
+    return psi0, current
+
+def write_geqdsk_scan(path_template, eq_type, epsilon, kappa, delta, A, xsep, ysep, R0, B0,
+                      psi0=None, current=None, log=sys.stderr, **options):
+    # Write one g-file for each set of parameters of a scan. The parameters
+    # are broadcast against each other (R0, B0, psi0 and current included),
+    # all the equilibria are solved at once, and the g-files are then written
+    # one at a time, to path_template.format(i) for the i-th parameter set in
+    # C order. This is a generator, which yields the path of each file once it
+    # has been written. The parameter sets which cannot be solved (singular
+    # system) or written (for example if the magnetic axis is not found) are
+    # reported to log, and yield None instead, without stopping the scan.
+    if (psi0 is None) == (current is None):
+        raise ValueError("exactly one of psi0 and current must be given")
+    parameters = np.broadcast_arrays(*[np.asarray(v, dtype=float) for v in (epsilon, kappa, delta, A, xsep, ysep)])
+    shape = parameters[0].shape
+    values = solve_parameter_sets(eq_type, np.column_stack([p.ravel() for p in parameters]), derived=False)
+    R0, B0, psi0, current = [np.broadcast_to(np.asarray(v, dtype=float), shape) if v is not None else None
+                             for v in (R0, B0, psi0, current)]
+    for i, index in enumerate(np.ndindex(shape)):
+        path = path_template.format(i)
+        C, A = values[i, :n_homogeneous], values[i, n_homogeneous]
+        error = "singular system" if np.isnan(A) else None
+        if error is None:
+            try:
+                write_geqdsk(path, C, A, R0[index], B0[index],
+                             psi0=None if psi0 is None else psi0[index],
+                             current=None if current is None else current[index], **options)
+            except (RuntimeError, np.linalg.LinAlgError, ValueError) as exception:
+                error = exception
+                if os.path.exists(path):
+                    os.remove(path)
+        if error is not None:
+            log.write("case %d: %s\n" % (i, error))
+            path = None
+        yield path
@@ -0,0 +1,253 @@
+# In this file, we evaluate the poloidal flux function psi of a solved
+# equilibrium, together with its gradient and its Hessian, at an arbitrary set
+# of points. This is the interface to use when coupling the exact solutions of
+# A.J. Cerfon and J.P. Freidberg, Physics of Plasmas 17, 032502 (2010) to finite
+# element or particle codes, which need psi at scattered quadrature nodes
+# rather than on the rectangular grid used in main.py.
+#
+# Typical usage, after C and A have been computed as in main.py:
+#
+#   points = np.load("nodes.npy", mmap_mode="r")     # shape (N,2)
+#   out = np.lib.format.open_memmap("psi.npy", mode="w+", shape=(len(points),3))
+#   evaluate_points(C, A, points, quantities=("psi","psix","psiy"), out=out)
+#
+# The points are processed in chunks of chunk_size points, and the results are
+# accumulated directly in the output array: the only temporary arrays are of
+# the size of one chunk, so that memory usage does not grow with N and memory
+# mapped inputs and outputs are never loaded in memory as a whole.
+#
+# With workers > 1, the chunks are distributed over a pool of threads, each of
+# which has its own chunk-sized buffers and writes its results directly into
+# its part of the output array, so that there is no copy and no merge step.
+# The evaluation consists of NumPy operations on whole chunks, which release
+# the GIL while they run, so that the threads run in parallel on large point
+# sets and grids.
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from ExactSolutions import basis, combination, n_homogeneous
+
+# psi and all its derivatives up to third order
+quantity_names = tuple(basis)
+
+chunk_size_default = 65536
+
+################################################################################
+#
+#   Coefficients of the general solution
+#
+################################################################################
+
+def solution_coefficients(C, A):
+    # Coefficients multiplying the functions listed in basis: the
+    # coefficients C of the homogeneous solutions, followed by A and (1-A)
+    # for the two particular solutions. C can be given as the (12,1) array
+    # computed in main.py, and A as a scalar or as a one-element array (as in
+    # the case "symmetric_beta_limit"). If ExactSolutions.py was generated
+    # with additional homogeneous solutions, C may omit their coefficients,
+    # which are then zero.
+    C = np.asarray(C, dtype=float).ravel()
+    if not 12 <= C.size <= n_homogeneous:
+        raise ValueError("expected 12 to %d coefficients C, got %d" % (n_homogeneous, C.size))
+    A = np.asarray(A, dtype=float).item()
+    return np.concatenate((C, np.zeros(n_homogeneous - C.size), [A, 1-A]))
+
+################################################################################
+#
+#   Evaluation at a set of points
+#
+################################################################################
+
+def _split_points(points, y):
+    # Return views on the x and y coordinates, without copying the data
+    points = np.asarray(points)
+    if y is not None:
+        y = np.asarray(y)
+        if points.ndim != 1 or y.shape != points.shape:
+            raise ValueError("x and y must be one-dimensional arrays of the same length")
+        return points, y
+    if points.ndim != 2 or points.shape[1] != 2:
+        raise ValueError("points must be an array of shape (N,2), or x and y must be given separately")
+    return points[:, 0], points[:, 1]
+
+def _check_quantities(quantities):
+    for name in quantities:
+        if name not in quantity_names:
+            raise ValueError("unknown quantity %r, expected one of %s" % (name, ", ".join(quantity_names)))
+
+def _evaluate_chunk(coefficients, active, quantities, xc, yc, columns, term, accumulator):
+    # Accumulate the linear combination of the basis functions for each of the
+    # quantities in the columns of columns, which is a view on the output.
+    # By default, the fused kernels of ExactSolutions.py evaluate the whole
+    # combination at once, as a polynomial in x, y and log(x). If accumulator
+    # is not None, the basis functions are evaluated one by one and their sum
+    # is accumulated in it instead, and then copied to the output. All these
+    # operations write into buffers of the size of the chunk.
+    for j, name in enumerate(quantities):
+        if accumulator is None:
+            columns[:, j] = combination[name](coefficients, xc, yc)
+            continue
+        accumulator[...] = 0
+        for k in active:
+            # The basis functions return scalars when they are constant,
+            # which np.multiply broadcasts to the size of the chunk
+            np.multiply(basis[name][k](xc, yc), coefficients[k], out=term)
+            np.add(accumulator, term, out=accumulator)
+        columns[:, j] = accumulator
+
+def _coefficients(C, A, dtype):
+    # Coefficients in the working precision, and the indices of the basis
+    # functions which contribute (for example, the up-down asymmetric terms of
+    # a symmetric equilibrium are skipped)
+    coefficients = solution_coefficients(C, A).astype(dtype)
+    return coefficients, np.flatnonzero(coefficients)
+
+def _accumulates(dtype, accumulate):
+    # Whether the sums are accumulated in another type than the basis
+    # functions, which requires evaluating them one by one
+    return accumulate is not None and np.dtype(accumulate) != np.dtype(dtype)
+
+def _buffers(n, dtype, accumulate):
+    # Chunk-sized buffers
+    term = np.empty(n, dtype=dtype)
+    accumulator = np.empty(n, dtype=accumulate) if _accumulates(dtype, accumulate) else None
+    return term, accumulator
+
+def _run(task, chunks, workers, buffers):
+    # Call task(start, stop, buffers) for all the chunks (start, stop), in
+    # workers threads (all the available cores if workers is None). The
+    # buffers are allocated once per thread by calling buffers().
+    workers = os.cpu_count() if workers is None else workers
+    if workers == 1 or len(chunks) <= 1:
+        thread_buffers = buffers()
+        for start, stop in chunks:
+            task(start, stop, thread_buffers)
+        return
+    local = threading.local()
+    def run(chunk):
+        if not hasattr(local, "buffers"):
+            local.buffers = buffers()
+        task(chunk[0], chunk[1], local.buffers)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # Consuming the results raises the exceptions of the threads
+        for _ in pool.map(run, chunks):
+            pass
+
+def evaluate_points(C, A, points, y=None, quantities=("psi",), out=None, chunk_size=chunk_size_default,
+                    dtype=np.float64, accumulate=None, workers=1):
+    # Evaluate the requested quantities at the points (x,y), where x and y are
+    # either the columns of points, of shape (N,2), or given separately as
+    # two arrays of shape (N,).
+    #
+    # quantities is a sequence of names taken from quantity_names. The result
+    # is returned in out, of shape (N,len(quantities)), which can be provided
+    # by the caller (including as a memory-mapped array) and is then filled in
+    # place. If a single quantity is requested, out can also have shape (N,).
+    #
+    # The basis functions are computed in the floating point type dtype, and
+    # summed in the type accumulate (by default, dtype), which is also the
+    # type of out if it is not provided. See the end of this file for the
+    # accuracy of single precision evaluations. The chunks are processed by
+    # workers threads (all the available cores if None).
+    x, y = _split_points(points, y)
+    n = x.shape[0]
+    _check_quantities(quantities)
+
+    if out is None:
+        out = np.empty((n, len(quantities)), dtype=dtype if accumulate is None else accumulate)
+    if out.shape == (n,) and len(quantities) == 1:
+        columns = out[:, np.newaxis]
+    elif out.shape == (n, len(quantities)):
+        columns = out
+    else:
+        raise ValueError("out has shape %s, expected (%d,%d)" % (out.shape, n, len(quantities)))
+
+    coefficients, active = _coefficients(C, A, dtype)
+    def task(start, stop, buffers):
+        term, accumulator = buffers
+        xc = x[start:stop].astype(dtype, copy=False)
+        yc = y[start:stop].astype(dtype, copy=False)
+        _evaluate_chunk(coefficients, active, quantities, xc, yc, columns[start:stop],
+                        term[:stop-start], None if accumulator is None else accumulator[:stop-start])
+    chunks = [(start, min(start + chunk_size, n)) for start in range(0, n, chunk_size)]
+    _run(task, chunks, workers, lambda: _buffers(min(chunk_size, n), dtype, accumulate))
+    return out
+
+def evaluate_grid(C, A, x, y, quantities=("psi",), out=None, chunk_size=chunk_size_default,
+                  dtype=np.float64, accumulate=None, workers=1):
+    # Evaluate the requested quantities on the grid of points (x[i],y[j]),
+    # as obtained with np.meshgrid(x, y) in main.py. The result is returned in
+    # out, of shape (len(y),len(x)) if a single quantity is requested and of
+    # shape (len(y),len(x),len(quantities)) otherwise, which must be C
+    # contiguous if it is provided. The grid is processed by blocks of rows
+    # of about chunk_size points. dtype, accumulate and workers are as in
+    # evaluate_points.
+    x = np.asarray(x)
+    y = np.asarray(y)
+    nx, ny = len(x), len(y)
+    _check_quantities(quantities)
+    shape = (ny, nx) if len(quantities) == 1 else (ny, nx, len(quantities))
+    if out is None:
+        out = np.empty(shape, dtype=dtype if accumulate is None else accumulate)
+    if out.shape != shape or not out.flags.c_contiguous:
+        raise ValueError("out must be a C contiguous array of shape %s" % (shape,))
+
+    rows = max(chunk_size//max(nx, 1), 1)
+    m = min(rows, ny)*nx
+    coefficients, active = _coefficients(C, A, dtype)
+    def buffers():
+        # The x coordinates of a block are the same for all the blocks
+        return _buffers(m, dtype, accumulate) + (np.tile(x.astype(dtype), min(rows, ny)), np.empty(m, dtype=dtype))
+    def task(start, stop, buffers):
+        term, accumulator, xc, yc = buffers
+        size = (stop - start)*nx
+        yc[:size].reshape(stop - start, nx)[...] = y[start:stop, np.newaxis]
+        _evaluate_chunk(coefficients, active, quantities, xc[:size], yc[:size],
+                        out[start:stop].reshape(size, len(quantities)),
+                        term[:size], None if accumulator is None else accumulator[:size])
+    _run(task, [(start, min(start + rows, ny)) for start in range(0, ny, rows)], workers, buffers)
+    return out
+
+################################################################################
+#
+#   Accuracy of single precision evaluations
+#
+################################################################################
+
+# With dtype=np.float32, the absolute error on each quantity is dominated by the
+# rounding errors made in the evaluation of the polynomials in x, y and log(x),
+# including the rounding of x and y themselves, and remains below
+#
+#   4*eps*(|c_1*f_1| + ... + |c_14*f_14|)
+#
+# where eps = np.finfo(np.float32).eps = 1.2e-7, c_k are the coefficients
+# returned by solution_coefficients and f_k the corresponding basis functions
+# (or their derivatives). This bound is returned by rounding_error_bound, and
+# was checked on 500x500 grids covering the plasmas of main.py, for the three
+# equilibrium types in ITER_Equilibria and Spheromaks, where the actual error is
+# at most 3.2 times the sum above. Relative to the maximum of |psi| on the grid,
+# the errors on psi and all its derivatives are of the order of 1e-6 for the
+# symmetric equilibria, and 5e-6 for the ITER single null equilibrium, in which
+# the large terms C[6]*psi7 and C[11]*psi12 nearly cancel.
+#
+# Accumulating the sums in double precision (dtype=np.float32,
+# accumulate=np.float64) evaluates the basis functions one by one in single
+# precision, and sums their contributions in double precision, into a double
+# precision result. This removes the rounding errors of the sum and of the
+# result, but not those of the basis functions, which dominate: on the grids
+# above, the errors are of the same order as in single precision, at the cost
+# of a much slower evaluation. It is mostly useful when many large terms
+# cancel in the sum.
+
+def rounding_error_bound(C, A, points, y=None, quantity="psi", dtype=np.float32):
+    # Bound on the error of the evaluation of quantity at the points with
+    # evaluate_points(..., dtype=dtype), relative to the exact values
+    x, y = _split_points(points, y)
+    _check_quantities([quantity])
+    coefficients = solution_coefficients(C, A)
+    total = np.zeros(x.shape)
+    for k in np.flatnonzero(coefficients):
+        total += np.abs(coefficients[k]*basis[quantity][k](x, y))
+    return 4*np.finfo(dtype).eps*total
@@ -0,0 +1,235 @@
+# In this file, we precompute the solutions of one equilibrium type on a
+# structured grid of the parameters (epsilon, kappa, delta, A, xsep, ysep), and
+# interpolate them for real-time uses, where even the assembly and solution of
+# the linear system of main.py for each query is too slow.
+#
+# For each parameter set of the grid, the table holds the coefficients
+# C[0], ..., C[11], A and ysep returned by solve_equilibrium, and the position
+# of the magnetic axis and the value of psi there. The table is stored in a
+# directory as two .npy files, which are opened as read-only memory maps (and
+# are therefore shared by all the processes using the same table through the
+# page cache of the operating system), and a JSON file describing the grid:
+#
+#   table.json   equilibrium type, values of each parameter on the grid,
+#                names of the tabulated values
+#   values.npy   array of shape (n_epsilon,...,n_ysep,n_values)
+#   error.npy    estimate of the interpolation error around each node, of the
+#                same shape, in single precision
+#
+# Parameters can be fixed by giving them a single value. The other parameters
+# are interpolated multilinearly, on grids which need not be uniform. The
+# interpolation error in a cell of sizes h_d is estimated by
+#
+#   sum over the parameters d of h_d**2/8*|d2f/dp_d2|
+#
+# where the second derivatives are computed by finite differences on the
+# grid, and the estimate returned for a query is the largest estimate at the
+# corners of its cell. Since the second derivatives also vary within a cell,
+# this is not a bound: a few values in a thousand exceed it, by up to about
+# 10%, on tables of kappa, delta and A such as the one below. The stored
+# estimates are therefore multiplied by a safety factor of 1.5. Along
+# parameters with only two values on the grid, the second derivatives are
+# unknown, and their contribution is missing. If all the parameters are fixed,
+# the table holds a single solution, which is returned with no error.
+#
+# Typical usage:
+#
+#   build_table("iter_table", "asym_single_null", epsilon=0.32, kappa=np.linspace(1.5, 1.9, 21),
+#               delta=np.linspace(0.2, 0.45, 26), A=np.linspace(-0.25, -0.05, 21), xsep=0.88, ysep=-0.6)
+#   table = SurrogateTable("iter_table")
+#   values, error = table(kappa=1.72, delta=0.31, A=-0.16)
+#   C, A, ysep = table.coefficients(kappa=1.72, delta=0.31, A=-0.16)
+
+import bisect
+import json
+import os
+import numpy as np
+from Equilibrium import parameter_names, value_names, solve_parameter_sets
+from ExactSolutions import n_homogeneous
+
+_safety_factor = 1.5
+
+################################################################################
+#
+#   Construction of the table
+#
+################################################################################
+
+def _second_difference(f, axis, grid_axis):
+    # |d2f/dp2|*h**2/8 at the nodes along one axis of the table, with
+    # h the larger of the two neighbouring cells. The values at the first and
+    # last nodes are those of their neighbours.
+    n = len(grid_axis)
+    result = np.zeros(f.shape)
+    if n < 3:
+        return result
+    h = np.diff(grid_axis)
+    shape = [1]*f.ndim
+    shape[axis] = n - 2
+    hm = h[:-1].reshape(shape)
+    hp = h[1:].reshape(shape)
+    take = lambda start, stop: np.take(f, np.arange(start, stop), axis=axis)
+    d2 = 2*((take(2, n) - take(1, n-1))/hp - (take(1, n-1) - take(0, n-2))/hm)/(hm + hp)
+    interior = np.abs(d2)*np.maximum(hm, hp)**2/8
+    index = [slice(None)]*f.ndim
+    index[axis] = slice(1, n-1)
+    result[tuple(index)] = interior
+    index[axis] = 0
+    result[tuple(index)] = np.take(interior, 0, axis=axis)
+    index[axis] = n - 1
+    result[tuple(index)] = np.take(interior, -1, axis=axis)
+    return result
+
+def build_table(path, eq_type, epsilon, kappa, delta, A, xsep=0., ysep=0., derived=True, batch_size=4096,
+                dtype=np.float64):
+    # Tabulate the solutions of the equilibrium type eq_type on the grid of
+    # all the combinations of the given values of the parameters (each one
+    # being a scalar or a one-dimensional increasing array), in the directory
+    # path. The linear systems are solved in batches of batch_size parameter
+    # sets. If derived is False, the magnetic axis is not computed, which
+    # makes the construction much faster.
+    axes = [np.atleast_1d(np.asarray(v, dtype=float)) for v in (epsilon, kappa, delta, A, xsep, ysep)]
+    for name, axis in zip(parameter_names, axes):
+        if axis.ndim != 1 or np.any(np.diff(axis) <= 0):
+            raise ValueError("the values of %s must form an increasing one-dimensional array" % name)
+    shape = tuple(len(axis) for axis in axes)
+    n = int(np.prod(shape))
+    os.makedirs(path, exist_ok=True)
+
+    values = np.lib.format.open_memmap(os.path.join(path, "values.npy"), mode="w+", dtype=dtype,
+                                       shape=shape + (len(value_names),))
+    flat = values.reshape(n, len(value_names))
+    for start in range(0, n, batch_size):
+        index = np.unravel_index(np.arange(start, min(start + batch_size, n)), shape)
+        parameters = np.column_stack([axis[i] for axis, i in zip(axes, index)])
+        flat[start:start+len(parameters)] = solve_parameter_sets(eq_type, parameters, derived)
+    values.flush()
+
+    error = np.lib.format.open_memmap(os.path.join(path, "error.npy"), mode="w+", dtype=np.float32,
+                                      shape=values.shape)
+    error[...] = _safety_factor*sum(_second_difference(values, d, axis) for d, axis in enumerate(axes))
+    error.flush()
+
+    metadata = {"eq_type": eq_type, "axes": {name: axis.tolist() for name, axis in zip(parameter_names, axes)},
+                "values": list(value_names), "derived": derived}
+    with open(os.path.join(path, "table.json"), "w") as f:
+        json.dump(metadata, f)
+    return SurrogateTable(path)
+
+################################################################################
+#
+#   Interpolation
+#
+################################################################################
+
+class SurrogateTable:
+    # Read-only access to a table built by build_table
+
+    def __init__(self, path):
+        with open(os.path.join(path, "table.json")) as f:
+            metadata = json.load(f)
+        self.path = path
+        self.eq_type = metadata["eq_type"]
+        self.axes = {name: np.array(metadata["axes"][name]) for name in parameter_names}
+        self.value_names = tuple(metadata["values"])
+        self.derived = metadata["derived"]
+        self.values = np.load(os.path.join(path, "values.npy"), mmap_mode="r")
+        self.error = np.load(os.path.join(path, "error.npy"), mmap_mode="r")
+        # Parameters which vary on the grid, the table with the fixed
+        # parameters removed (as plain arrays rather than np.memmap, whose
+        # indexing is slower), and the offsets of the corners of a cell in it
+        self.varying = [name for name in parameter_names if len(self.axes[name]) > 1]
+        self._axes = [self.axes[name] for name in self.varying]
+        self._lists = [axis.tolist() for axis in self._axes]
+        shape = tuple(len(axis) for axis in self._axes)
+        self._values = np.asarray(self.values).reshape(-1, len(self.value_names))
+        self._error = np.asarray(self.error).reshape(-1, len(self.value_names))
+        self._strides = [int(np.prod(shape[d+1:])) for d in range(len(shape))]
+        self._corners = np.array(list(np.ndindex(*(2,)*len(shape))), dtype=int).reshape(2**len(shape), len(shape))
+        self._offsets = self._corners @ np.array(self._strides, dtype=int)
+        self._order = self._corners @ (1 << np.arange(len(shape), dtype=int))
+
+    def _check(self, parameters):
+        for name, value in parameters.items():
+            if name not in parameter_names:
+                raise TypeError("unknown parameter %r" % name)
+            if name not in self.varying and np.any(np.asarray(value) != self.axes[name][0]):
+                raise ValueError("%s is fixed to %g in this table" % (name, self.axes[name][0]))
+        missing = [name for name in self.varying if name not in parameters]
+        if missing:
+            raise TypeError("missing parameters: %s" % ", ".join(missing))
+
+    def _out_of_range(self, name, axis):
+        return ValueError("%s is outside of the range [%g,%g] of the table" % (name, axis[0], axis[-1]))
+
+    def _cell(self, parameters, extrapolate):
+        # Cell containing a single query, found with bisect rather than with
+        # array operations, whose overhead dominates for a single point.
+        # Return the index of its first corner and the interpolation weights
+        # of its corners.
+        base = 0
+        weights = [1.]
+        for name, axis, stride in zip(self.varying, self._lists, self._strides):
+            p = float(parameters[name])
+            if not extrapolate and not axis[0] <= p <= axis[-1]:
+                raise self._out_of_range(name, axis)
+            i = min(max(bisect.bisect_right(axis, p) - 1, 0), len(axis) - 2)
+            t = (p - axis[i])/(axis[i+1] - axis[i])
+            base += i*stride
+            weights = [w*(1 - t) for w in weights] + [w*t for w in weights]
+        # weights are in the order of the corners with the first parameter
+        # varying fastest, and are reordered to match self._corners
+        return base, np.array(weights)[self._order]
+
+    def _cells(self, parameters, extrapolate):
+        # Same as _cell, for arrays of queries
+        positions = np.broadcast_arrays(*[np.asarray(parameters[name], dtype=float) for name in self.varying])
+        shape = positions[0].shape
+        base = 0
+        weights = 1.
+        for d, (name, axis) in enumerate(zip(self.varying, self._axes)):
+            p = positions[d].ravel()
+            if not extrapolate and (np.any(p < axis[0]) or np.any(p > axis[-1])):
+                raise self._out_of_range(name, axis)
+            i = np.clip(np.searchsorted(axis, p, side="right") - 1, 0, len(axis) - 2)
+            t = ((p - axis[i])/(axis[i+1] - axis[i]))[:, np.newaxis]
+            base = base + i*self._strides[d]
+            weights = weights*np.where(self._corners[:, d], t, 1 - t)
+        return shape, base, weights
+
+    def __call__(self, extrapolate=False, **parameters):
+        # Interpolate the tabulated values at the parameters given as keyword
+        # arguments (scalars or arrays, which are broadcast against each
+        # other). The parameters which are fixed in the table can be omitted.
+        # Return the values, of shape (...,len(value_names)), and the estimate
+        # of the interpolation error, of the same shape, to which the
+        # rounding errors of the interpolation are added.
+        self._check(parameters)
+        if all(np.ndim(parameters[name]) == 0 for name in self.varying):
+            base, weights = self._cell(parameters, extrapolate)
+            rows = base + self._offsets
+            values = weights @ self._values[rows]
+            error = self._error[rows].max(axis=0)
+        else:
+            shape, base, weights = self._cells(parameters, extrapolate)
+            rows = base[:, np.newaxis] + self._offsets
+            values = np.einsum("nc,ncv->nv", weights, self._values[rows]).reshape(shape + (-1,))
+            error = self._error[rows].max(axis=1).reshape(shape + (-1,))
+        return values, error + 4*np.finfo(float).eps*np.abs(values)
+
+    def coefficients(self, extrapolate=False, **parameters):
+        # Interpolated C, A and ysep, as returned by solve_equilibrium
+        values, _ = self(extrapolate, **parameters)
+        return values[..., :n_homogeneous], values[..., n_homogeneous], values[..., n_homogeneous+1]
+
+    def validate(self, n_samples=1000, seed=0):
+        # Compare the interpolation with exact solutions at n_samples random
+        # parameter sets within the table. Return the actual errors and the
+        # estimates, both of shape (n_samples,len(value_names)).
+        rng = np.random.default_rng(seed)
+        samples = {name: rng.uniform(self.axes[name][0], self.axes[name][-1], n_samples) for name in self.varying}
+        values, estimate = self(**samples)
+        parameters = np.column_stack([samples[name] if name in self.varying else np.full(n_samples, self.axes[name][0])
+                                      for name in parameter_names])
+        exact = solve_parameter_sets(self.eq_type, parameters, self.derived)
+        return np.abs(values - exact), estimate
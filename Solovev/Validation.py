@@ -0,0 +1,147 @@
+# In this file, we check that the functions of ExactSolutions.py and the
+# equilibria computed from them are correct, cheaply enough for the checks to
+# remain enabled in production scans.
+#
+# check_basis verifies, at random points:
+#   - that the homogeneous solutions satisfy x*d/dx(1/x*dpsi/dx) + d2psi/dy2 = 0,
+#     and that the particular solutions psipart1 and psipart2 give 1 and x**2,
+#     so that the general solution satisfies the Grad-Shafranov equation
+#     x*d/dx(1/x*dpsi/dx) + d2psi/dy2 = A + (1-A)*x**2
+#   - that each coded derivative is the derivative of the function of lower
+#     order, computed with a complex step, f'(x) = Im(f(x+i*h))/h, which is
+#     exact to rounding errors because all the functions are analytic
+#   - that the fused kernels evaluate the same combination as the functions
+#     listed in basis
+#
+# validate_equilibria checks a batch of solved equilibria, all at once:
+#   - the residual of the boundary conditions M*C - b, with M and b assembled
+#     as in solve_equilibrium, for the returned value of A, relative to the
+#     size of the terms of M*C and b
+#   - that A was returned unchanged, except at the equilibrium beta limit
+#     where it is computed
+# and returns these metrics for each equilibrium, with a mask of the
+# equilibria which pass both checks, so that corrupted results can be
+# rejected before they are used. Since every function of basis satisfies the
+# Grad-Shafranov equation, the general solution satisfies it for any C and A,
+# and checking it for each equilibrium would not reveal anything that
+# check_basis does not: it is only checked for the functions of basis.
+
+import numpy as np
+from Equilibrium import assemble_system
+from ExactSolutions import basis, combination, n_homogeneous
+
+# Right-hand sides of the Grad-Shafranov operator for the functions of basis
+_right_hand_sides = [lambda x: 0*x]*n_homogeneous + [lambda x: 1 + 0*x, lambda x: x**2]
+
+def _evaluate(f, x, y):
+    # Constant functions return scalars
+    return np.broadcast_to(f(x, y), np.broadcast(x, y).shape)
+
+################################################################################
+#
+#   Functions of ExactSolutions.py
+#
+################################################################################
+
+def basis_residuals(n_points=256, xlim=(0.1, 2.), ylim=(-2., 2.), seed=0):
+    # Relative residuals of the checks of the functions of ExactSolutions.py
+    # at n_points random points of the rectangle xlim x ylim. Return a
+    # dictionary with
+    #   "grad_shafranov": residuals of the Grad-Shafranov equation for each
+    #                     function of basis, of shape (n_homogeneous+2,)
+    #   "derivatives":    for each derivative (the keys of basis except psi),
+    #                     the largest discrepancy over the functions of basis
+    #   "combination":    for each derivative, the discrepancy between the
+    #                     fused kernel and the sum over the functions of basis
+    rng = np.random.default_rng(seed)
+    x = rng.uniform(*xlim, n_points)
+    y = rng.uniform(*ylim, n_points)
+    n = len(basis["psi"])
+
+    grad_shafranov = np.empty(n)
+    for k in range(n):
+        psix, psixx, psiyy = [_evaluate(basis[name][k], x, y) for name in ("psix", "psixx", "psiyy")]
+        rhs = _right_hand_sides[k](x)
+        residual = psixx - psix/x + psiyy - rhs
+        scale = np.abs(psixx) + np.abs(psix/x) + np.abs(psiyy) + np.abs(rhs)
+        grad_shafranov[k] = np.max(np.abs(residual))/max(np.max(scale), 1e-300)
+
+    h = 1e-30
+    derivatives = {}
+    for name in basis:
+        if name == "psi":
+            continue
+        parent, variable = name[:-1], name[-1]
+        worst = 0.
+        for k in range(n):
+            if variable == "x":
+                step = np.imag(_evaluate(basis[parent][k], x + 1j*h, y))/h
+            else:
+                step = np.imag(_evaluate(basis[parent][k], x, y + 1j*h))/h
+            coded = _evaluate(basis[name][k], x, y)
+            scale = max(np.max(np.abs(coded)), np.max(np.abs(step)), 1e-300)
+            worst = max(worst, np.max(np.abs(coded - step))/scale)
+        derivatives[name] = worst
+
+    c = rng.normal(size=n)
+    fused = {}
+    for name in basis:
+        terms = np.array([c[k]*_evaluate(basis[name][k], x, y) for k in range(n)])
+        total = _evaluate(lambda x, y: combination[name](c, x, y), x, y)
+        fused[name] = np.max(np.abs(total - terms.sum(axis=0)))/max(np.max(np.abs(terms).sum(axis=0)), 1e-300)
+    return {"grad_shafranov": grad_shafranov, "derivatives": derivatives, "combination": fused}
+
+def check_basis(tol=1e-10, **options):
+    # Raise a RuntimeError listing the checks of basis_residuals which fail
+    # with the tolerance tol
+    residuals = basis_residuals(**options)
+    failures = ["Grad-Shafranov equation for function %d of basis: %.3g" % (k, r)
+                for k, r in enumerate(residuals["grad_shafranov"]) if not r <= tol]
+    failures += ["derivative %s: %.3g" % (name, r) for name, r in residuals["derivatives"].items() if not r <= tol]
+    failures += ["fused kernel for %s: %.3g" % (name, r) for name, r in residuals["combination"].items() if not r <= tol]
+    if failures:
+        raise RuntimeError("ExactSolutions.py failed the checks:\n  " + "\n  ".join(failures))
+    return residuals
+
+################################################################################
+#
+#   Solved equilibria
+#
+################################################################################
+
+def constraint_residuals(eq_type, epsilon, kappa, delta, xsep, ysep, C, A):
+    # Relative residuals of the boundary conditions, max|M*u - b| divided by
+    # max(|M|*|u| + |b|), for the equilibria with parameters epsilon, kappa,
+    # delta, xsep and ysep, and coefficients C, of shape (...,n_homogeneous),
+    # and A as returned by solve_equilibrium. M and b are assembled with this
+    # value of A, and u holds the unknowns of the linear system: the first 7
+    # or 12 coefficients C, and A at the equilibrium beta limit.
+    C = np.asarray(C, dtype=float)
+    A = np.asarray(A, dtype=float)
+    M, b = assemble_system(eq_type, epsilon, kappa, delta, A, xsep, ysep)
+    n = M.shape[-1]
+    if eq_type == "symmetric_beta_limit":
+        u = np.concatenate((C[..., :n-1], A[..., np.newaxis]), axis=-1)
+    else:
+        u = C[..., :n]
+    terms = M*u[..., np.newaxis, :]
+    residual = terms.sum(axis=-1) - b
+    scale = np.max(np.abs(terms).sum(axis=-1) + np.abs(b), axis=-1)
+    return np.max(np.abs(residual), axis=-1)/scale
+
+def validate_equilibria(eq_type, epsilon, kappa, delta, A_in, xsep, ysep, C, A, tol_constraints=1e-10):
+    # Check a batch of equilibria, solved with the parameters (epsilon, ...,
+    # ysep) by solve_equilibrium, which returned C and A. Return a dictionary
+    # with the arrays "constraints" of the residuals of the boundary
+    # conditions of each equilibrium, and "A" of the relative differences
+    # between A and A_in (0 at the equilibrium beta limit), and the boolean
+    # mask "valid" of the equilibria for which both are finite and below
+    # tol_constraints.
+    constraints = constraint_residuals(eq_type, epsilon, kappa, delta, xsep, ysep, C, A)
+    A_in, A = np.broadcast_arrays(np.asarray(A_in, dtype=float), np.asarray(A, dtype=float))
+    if eq_type == "symmetric_beta_limit":
+        difference = np.where(np.isfinite(A), 0., np.nan)
+    else:
+        difference = np.abs(A - A_in)/np.maximum(np.abs(A_in), 1)
+    valid = (constraints <= tol_constraints) & (difference <= tol_constraints)
+    return {"constraints": constraints, "A": difference, "valid": valid}
@@ -0,0 +1,296 @@
+# This script solves a stream of equilibria, given as parameter records in CSV,
+# JSON lines or NumPy .npy format, and writes the results as a stream of JSON
+# lines, CSV rows or binary frames. It reads its input lazily and processes it
+# in batches, so that its memory usage does not depend on the size of the input,
+# and it can be used in Unix pipelines:
+#
+#   python solve_stream.py scan.csv > results.jsonl
+#   generate_cases | python solve_stream.py --derived --output-format csv | ...
+#
+# Each record gives the parameters epsilon, kappa, delta, A, xsep and ysep, and
+# optionally eq_type, as columns of a CSV file with a header line, as keys of
+# JSON objects (one per line), or as the columns of an array of shape (N,6)
+# (or as the fields of a structured array) in a .npy file. Missing values are
+# taken from the --default options, or from --eq-type for the equilibrium
+# type. The parameters which do not enter the solution default to 0: xsep and
+# ysep except for "asym_single_null", and A at the equilibrium beta limit,
+# where it is computed. The other fields of CSV and JSON records (for example a case
+# identifier) are copied to the output. In CSV output, they are the columns
+# listed with --fields or, by default, the other fields of the first record;
+# a record with other fields stops the output with an error, rather than
+# losing them.
+#
+# The results are C[0], ..., C[11], A and ysep as computed in main.py and, with
+# --derived, the position of the magnetic axis and psi there (see
+# solve_parameter_sets in Equilibrium.py), preceded by the index of the record
+# in the input, the equilibrium type and the parameters epsilon, kappa, delta
+# and xsep. The binary format is a JSON line listing the columns, followed by
+# one frame per batch: the number of records (little-endian unsigned 64-bit
+# integer) and the values, as an array of float64 of shape (number of records,
+# number of columns), where the equilibrium type is replaced by its index in
+# eq_types. Records which cannot be solved (invalid JSON lines, missing
+# parameters, unknown equilibrium type, singular system) are reported on
+# stderr, and their results are NaN (null, with an "error" field, in JSON
+# lines). With --validate, the
+# solutions are checked with validate_equilibria (see Validation.py), and those
+# which fail the checks are reported and rejected in the same way.
+
+import argparse
+import csv
+import io
+import json
+import os
+import struct
+import sys
+import numpy as np
+from Equilibrium import eq_types, parameter_names, unused_parameters, value_names, solve_parameter_sets
+from ExactSolutions import n_homogeneous
+from Validation import check_basis, validate_equilibria
+
+# Parameters copied to the output. A and ysep are part of the results, since
+# they are computed for some equilibrium types.
+output_parameters = tuple(name for name in parameter_names if name not in value_names)
+_output_columns = [parameter_names.index(name) for name in output_parameters]
+
+################################################################################
+#
+#   Input
+#
+################################################################################
+
+def _detect_format(stream, path):
+    # Format given by the extension of the file, or by its first bytes
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".csv", ".jsonl", ".npy"):
+        return extension[1:]
+    start = stream.peek(6)[:6]
+    if start.startswith(b"\x93NUMPY"):
+        return "npy"
+    return "jsonl" if start.lstrip().startswith(b"{") else "csv"
+
+def _read_csv(stream):
+    for row in csv.DictReader(io.TextIOWrapper(stream, encoding="utf-8", newline="")):
+        yield row
+
+def _read_jsonl(stream):
+    # Lines which are not JSON objects are yielded as ValueError, so that
+    # they only fail their own record
+    for line in io.TextIOWrapper(stream, encoding="utf-8"):
+        if line.strip():
+            try:
+                record = json.loads(line)
+            except ValueError as error:
+                yield ValueError("invalid JSON line: %s" % error)
+                continue
+            if not isinstance(record, dict):
+                record = ValueError("the line is not a JSON object")
+            yield record
+
+def _read_npy(stream, rows_per_read=4096):
+    # Read the array row by row from the stream, which may not be seekable
+    version = np.lib.format.read_magic(stream)
+    read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+    shape, fortran_order, dtype = read_header(stream)
+    if dtype.names is None:
+        if len(shape) != 2 or shape[1] != len(parameter_names) or fortran_order:
+            raise ValueError("the array must be of shape (N,%d) and in C order, or have named fields" % len(parameter_names))
+        names = parameter_names
+    else:
+        if len(shape) != 1:
+            raise ValueError("the structured array must be one-dimensional")
+        names = dtype.names
+    row_bytes = dtype.itemsize*(shape[1] if dtype.names is None else 1)
+    remaining = shape[0]
+    while remaining:
+        n = min(rows_per_read, remaining)
+        data = stream.read(n*row_bytes)
+        if len(data) != n*row_bytes:
+            raise ValueError("unexpected end of the .npy input")
+        rows = np.frombuffer(data, dtype=dtype).reshape(n, -1) if dtype.names is None else np.frombuffer(data, dtype=dtype)
+        for row in rows:
+            if dtype.names is None:
+                yield dict(zip(names, row.tolist()))
+            else:
+                yield {name: row[name].item() for name in names}
+        remaining -= n
+
+def read_records(stream, input_format, defaults, eq_type):
+    # Generator of the records of the input, as tuples (eq_type, parameters,
+    # extra fields, error message)
+    reader = {"csv": _read_csv, "jsonl": _read_jsonl, "npy": _read_npy}[input_format]
+    for record in reader(stream):
+        if isinstance(record, ValueError):
+            yield None, [np.nan]*len(parameter_names), {}, str(record)
+            continue
+        record = dict(record)
+        kind = record.pop("eq_type", None) or eq_type
+        parameters = []
+        error = None if kind in eq_types else "unknown equilibrium type %r" % kind
+        for name in parameter_names:
+            value = record.pop(name, None)
+            if value in (None, ""):
+                value = defaults.get(name, 0. if name in unused_parameters.get(kind, ()) else None)
+            if value is None:
+                parameters.append(np.nan)
+                error = error or "missing value of %s" % name
+                continue
+            try:
+                parameters.append(float(value))
+            except (TypeError, ValueError):
+                parameters.append(np.nan)
+                error = error or "invalid value of %s: %r" % (name, value)
+        yield kind, parameters, record, error
+
+################################################################################
+#
+#   Solution
+#
+################################################################################
+
+def batches(records, batch_size):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def solve_batches(batches, derived, validate=False, log=sys.stderr):
+    # Solve the records of each batch, with one call to solve_parameter_sets
+    # per equilibrium type, and yield the index of its first record, the
+    # batch, the parameters to output, the array of results and the error
+    # messages (None for the records which were solved). If validate is True,
+    # the results which fail the checks of validate_equilibria are rejected.
+    if validate:
+        check_basis()
+    index = 0
+    for batch in batches:
+        values = np.full((len(batch), len(value_names)), np.nan)
+        parameters = np.array([record[1] for record in batch], dtype=float)
+        kinds = np.array([record[0] if record[3] is None else "" for record in batch], dtype=object)
+        for kind in eq_types:
+            rows = np.flatnonzero(kinds == kind)
+            if rows.size:
+                values[rows] = solve_parameter_sets(kind, parameters[rows], derived)
+        errors = [record[3] for record in batch]
+        rejected = np.zeros(len(batch), dtype=bool)
+        if validate:
+            for kind in eq_types:
+                rows = np.flatnonzero((kinds == kind) & ~np.isnan(values[:, n_homogeneous]))
+                if rows.size:
+                    checks = validate_equilibria(kind, *parameters[rows].T, values[rows, :n_homogeneous],
+                                                 values[rows, n_homogeneous])
+                    rejected[rows] = ~checks["valid"]
+        for i, error in enumerate(errors):
+            if error is None and np.isnan(values[i, n_homogeneous]):
+                errors[i] = error = "singular system"
+            elif error is None and rejected[i]:
+                errors[i] = error = "solution failed validation"
+                values[i] = np.nan
+            if error is not None:
+                log.write("record %d: %s\n" % (index + i, error))
+        if not derived:
+            values = values[:, :n_homogeneous+2]
+        yield index, batch, parameters[:, _output_columns], values, errors
+        index += len(batch)
+
+################################################################################
+#
+#   Output
+#
+################################################################################
+
+def write_jsonl(results, out):
+    for start, batch, parameters, values, errors in results:
+        for i, (kind, _, extra, _) in enumerate(batch):
+            record = {"index": start + i}
+            record.update(extra)
+            record["eq_type"] = kind
+            p = [None if np.isnan(value) else value for value in parameters[i].tolist()]
+            record.update(zip(output_parameters, p))
+            v = [None if np.isnan(value) else value for value in values[i].tolist()]
+            record["C"] = v[:n_homogeneous]
+            record.update(zip(value_names[n_homogeneous:], v[n_homogeneous:]))
+            if errors[i] is not None:
+                record["error"] = errors[i]
+            out.write((json.dumps(record) + "\n").encode())
+        out.flush()
+
+def write_csv(results, out, derived, extra_names=None):
+    # extra_names are the columns of the other fields of the records, by
+    # default those of the first record
+    text = io.TextIOWrapper(out, encoding="utf-8", newline="", write_through=True)
+    writer = None
+    names = value_names if derived else value_names[:n_homogeneous+2]
+    for start, batch, parameters, values, errors in results:
+        if writer is None:
+            extra_names = list(batch[0][2]) if extra_names is None else list(extra_names)
+            writer = csv.writer(text)
+            writer.writerow(["index"] + extra_names + ["eq_type"] + list(output_parameters) + list(names))
+        for i, (kind, _, extra, _) in enumerate(batch):
+            unknown = [name for name in extra if name not in extra_names]
+            if unknown:
+                raise ValueError("record %d has the fields %s, which are not among the CSV columns (see --fields)"
+                                 % (start + i, ", ".join(unknown)))
+            writer.writerow([start + i] + [extra.get(name, "") for name in extra_names] + [kind]
+                            + parameters[i].tolist() + values[i].tolist())
+        text.flush()
+    text.detach()
+
+def write_binary(results, out, derived):
+    names = value_names if derived else value_names[:n_homogeneous+2]
+    columns = ["index", "eq_type"] + list(output_parameters) + list(names)
+    out.write((json.dumps({"columns": columns, "dtype": "<f8"}) + "\n").encode())
+    for start, batch, parameters, values, errors in results:
+        kinds = [eq_types.index(kind) if kind in eq_types else -1 for kind, _, _, _ in batch]
+        frame = np.column_stack((np.arange(start, start + len(batch)), kinds, parameters, values)).astype("<f8")
+        out.write(struct.pack("<Q", len(batch)))
+        out.write(frame.tobytes())
+        out.flush()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve a stream of Solov'ev equilibria")
+    parser.add_argument("input", nargs="?", default="-", help="input file (default: standard input)")
+    parser.add_argument("-o", "--output", default="-", help="output file (default: standard output)")
+    parser.add_argument("--input-format", choices=("csv", "jsonl", "npy"),
+                        help="format of the input (default: from the extension, or from the first bytes)")
+    parser.add_argument("--output-format", choices=("jsonl", "csv", "binary"), default="jsonl")
+    parser.add_argument("--eq-type", default="symmetric", choices=eq_types,
+                        help="equilibrium type of the records which do not specify it")
+    parser.add_argument("-D", "--default", action="append", default=[], metavar="NAME=VALUE",
+                        help="value of a parameter for the records which do not specify it")
+    parser.add_argument("--batch-size", type=int, default=1024)
+    parser.add_argument("--fields", type=lambda value: value.split(",") if value else [], metavar="NAME,...",
+                        help="other fields of the records copied to the CSV output (default: those of the first record)")
+    parser.add_argument("--derived", action="store_true", help="compute the magnetic axis as well")
+    parser.add_argument("--validate", action="store_true",
+                        help="check the residuals of the solutions, and reject those which fail")
+    args = parser.parse_args()
+
+    defaults = {}
+    for item in args.default:
+        name, _, value = item.partition("=")
+        if name not in parameter_names:
+            parser.error("unknown parameter %r in --default" % name)
+        defaults[name] = float(value)
+
+    stream = sys.stdin.buffer if args.input == "-" else open(args.input, "rb")
+    out = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+    input_format = args.input_format or _detect_format(stream, args.input)
+    results = solve_batches(batches(read_records(stream, input_format, defaults, args.eq_type), args.batch_size),
+                            args.derived, args.validate)
+    try:
+        if args.output_format == "jsonl":
+            write_jsonl(results, out)
+        elif args.output_format == "csv":
+            write_csv(results, out, args.derived, args.fields)
+        else:
+            write_binary(results, out, args.derived)
+    except BrokenPipeError:
+        # The reader of the output went away, as in "... | head"
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
+    except ValueError as error:
+        sys.exit("solve_stream.py: error: %s" % error)
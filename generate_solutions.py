@@ -0,0 +1,242 @@
+# This script generates the file Solovev/ExactSolutions.py, shared by
+# ITER_Equilibria and Spheromaks, which contains the homogeneous and
+# particular solutions to the Grad-Shafranov equation
+#
+#   x*d/dx(1/x*dpsi/dx) + d2psi/dy2 = A + (1-A)*x**2
+#
+# defined in A.J. Cerfon and J.P. Freidberg, ``One size fits all" analytic
+# solutions to the Grad-Shafranov equation, Physics of Plasmas 17, 032502 (2010),
+# together with all their derivatives up to third order.
+#
+# The 12 homogeneous and 2 particular solutions of the article are checked
+# symbolically against the Grad-Shafranov operator. Additional homogeneous
+# solutions, of degree 7 and higher in x and y, can be added with --degree.
+# They are derived from the operator itself:
+# for each degree d, the solutions of the form
+#
+#   sum over even i of (a_i + b_i*log(x))*x**i*y**(d-i)
+#
+# form a space of dimension 2, in which we choose the solution without
+# logarithmic terms, and the solution in which the coefficient of x**d (or of
+# x**(d-1)*y for odd d) vanishes. Both are normalized to have coprime integer
+# coefficients. The boundary conditions of Equilibrium.py only determine the
+# coefficients of the 12 solutions of the article, and those of the additional
+# solutions are always 0 in the equilibria it computes: they are only
+# available for user code which sets up its own shaping constraints with the
+# functions of basis.
+#
+# In addition to one function per solution and per derivative, as in the
+# original hand-written file, the generated module contains one fused kernel
+# per derivative, which evaluates the linear combination of all the solutions
+# with given coefficients. The kernels are written as polynomials in x, y and
+# log(x), whose coefficients are computed once per call from the coefficients
+# of the combination, and which are evaluated with a nested Horner scheme:
+# log(x) is computed once instead of once per solution, and no power of x or y
+# is recomputed.
+#
+# Usage (requires SymPy, which is not needed to use the generated module):
+#
+#   python generate_solutions.py [--degree D] [--output PATH ...]
+
+import argparse
+import os
+import sympy as sp
+
+x, y = sp.symbols("x y", positive=True)
+
+# Solutions of the article, in the order of the coefficients C[0], ..., C[11]
+homogeneous_solutions = [
+    "1",
+    "x**2",
+    "y**2-x**2*log(x)",
+    "x**4-4*x**2*y**2",
+    "2*y**4-9*y**2*x**2+3*x**4*log(x)-12*x**2*y**2*log(x)",
+    "x**6-12*x**4*y**2+8*x**2*y**4",
+    "8*y**6-140*y**4*x**2+75*y**2*x**4-15*x**6*log(x)+180*x**4*y**2*log(x)-120*x**2*y**4*log(x)",
+    "y",
+    "y*x**2",
+    "y**3-3*y*x**2*log(x)",
+    "3*y*x**4-4*y**3*x**2",
+    "8*y**5-45*y*x**4-80*y**3*x**2*log(x)+60*y*x**4*log(x)",
+]
+
+particular_solutions = [
+    ("psipart1", "x**2*log(x)/2", 1),
+    ("psipart2", "x**4/8", x**2),
+]
+
+derivatives = ["", "x", "y", "xx", "xy", "yy", "xxx", "xxy", "xyy", "yyy"]
+
+def grad_shafranov(f):
+    return sp.simplify(x*sp.diff(sp.diff(f, x)/x, x) + sp.diff(f, y, 2))
+
+def derivative(f, name):
+    for variable in name:
+        f = sp.diff(f, {"x": x, "y": y}[variable])
+    return sp.expand(f)
+
+################################################################################
+#
+#   Derivation of the higher order homogeneous solutions
+#
+################################################################################
+
+def _integer_normalization(f):
+    poly = sp.Poly(sp.expand(f.subs(sp.log(x), sp.Symbol("L"))), x, y, sp.Symbol("L"))
+    coefficients = poly.coeffs()
+    scale = sp.ilcm(*[sp.fraction(c)[1] for c in coefficients])
+    integers = [int(c*scale) for c in coefficients]
+    divisor = sp.igcd(*integers)
+    # Make the coefficient of the highest power of y positive
+    leading = sp.Poly(sp.expand(f), y).LC()
+    sign = 1 if sp.Poly(sp.expand(leading.subs(sp.log(x), sp.Symbol("L"))), x, sp.Symbol("L")).LC() > 0 else -1
+    return sp.expand(sign*sp.Rational(scale, divisor)*f)
+
+def homogeneous_solutions_of_degree(d):
+    L = sp.Symbol("L")
+    monomials = [x**i*y**(d - i) for i in range(0, d + 1, 2)]
+    a = sp.symbols("a0:%d" % len(monomials))
+    b = sp.symbols("b0:%d" % len(monomials))
+    unknowns = list(a) + list(b)
+    f = sum(ai*m for ai, m in zip(a, monomials)) + sum(bi*m*sp.log(x) for bi, m in zip(b, monomials))
+    residual = sp.expand(x**2*(x*sp.diff(sp.diff(f, x)/x, x) + sp.diff(f, y, 2)))
+    equations = sp.Poly(residual.subs(sp.log(x), L), x, y, L).coeffs()
+
+    # Solution without logarithmic terms
+    polynomial = sp.linsolve(equations + list(b), unknowns)
+    # Solution with a vanishing coefficient for x**d (x**(d-1)*y for odd d),
+    # and a unit coefficient for the corresponding logarithmic term
+    logarithmic = sp.linsolve(equations + [a[-1], b[-1] - 1], unknowns)
+
+    solutions = []
+    for solution_set in (polynomial, logarithmic):
+        (values,) = solution_set
+        free = sorted(set().union(*[sp.sympify(v).free_symbols for v in values]) & set(unknowns), key=str)
+        values = [sp.sympify(v).subs({s: 1 for s in free}) for v in values]
+        g = f.subs(dict(zip(unknowns, values)))
+        if grad_shafranov(g) != 0 or g == 0:
+            raise RuntimeError("could not derive the homogeneous solutions of degree %d" % d)
+        solutions.append(_integer_normalization(g))
+    return solutions
+
+################################################################################
+#
+#   Code generation
+#
+################################################################################
+
+def _code(expression):
+    return str(expression).replace("log(x)", "np.log(x)").replace(" ", "")
+
+def _fused_kernel(name, expressions, n):
+    # Kernel for the combination sum_k c[k]*expressions[k], written as a
+    # polynomial in x, y and lx = log(x), possibly divided by a power of x
+    L = sp.Symbol("lx")
+    c = sp.symbols("c0:%d" % n)
+    total = sp.expand(sum(ck*e for ck, e in zip(c, expressions)).subs(sp.log(x), L))
+    if total == 0:
+        return "def combination_%s(c,x,y):\n   return 0*x\n" % name
+    shift = -min(min(term.as_powers_dict().get(x, 0) for term in sp.Add.make_args(total)), 0)
+    poly = sp.Poly(sp.expand(total*x**shift), x, y, L)
+
+    # One coefficient per monomial, linear in c
+    lines = ["def combination_%s(c,x,y):" % name]
+    monomials = {}
+    for k, (powers, coefficient) in enumerate(poly.terms()):
+        symbol = sp.Symbol("k%d" % k)
+        monomials[powers] = symbol
+        lines.append("   %s = %s" % (symbol, _index_coefficients(str(coefficient).replace(" ", ""), n)))
+    if any(powers[2] for powers in monomials):
+        lines.append("   lx = np.log(x)")
+    # When all the powers of x have the same parity, which is the case for all
+    # the kernels of the solutions of the article, factor out x and use x**2 as
+    # the variable of the Horner scheme
+    X2 = sp.Symbol("x2")
+    parities = set(p[0] % 2 for p in monomials)
+    if len(parities) == 1:
+        odd = parities.pop()
+        polynomial = sum(symbol*X2**(p[0]//2)*y**p[1]*L**p[2] for p, symbol in monomials.items())
+        horner = sp.horner(polynomial, L, y, X2) if polynomial.free_symbols & {X2, y, L} else polynomial
+        if horner.has(X2):
+            lines.append("   x2 = x*x")
+        body = str(horner).replace(" ", "")
+        shift -= odd
+        if odd:
+            body = "x*(%s)" % body if shift < 0 else "(%s)" % body
+    else:
+        polynomial = sum(symbol*x**p[0]*y**p[1]*L**p[2] for p, symbol in monomials.items())
+        body = str(sp.horner(polynomial, L, y, x)).replace(" ", "")
+    if shift > 0:
+        body = "(%s)/x**%d" % (body, shift) if shift > 1 else "(%s)/x" % body
+    lines.append("   return %s" % body)
+    return "\n".join(lines) + "\n"
+
+def _index_coefficients(line, n):
+    for k in reversed(range(n)):
+        line = line.replace("c%d" % k, "c[%d]" % k)
+    return line
+
+def generate(degree):
+    solutions = [sp.sympify(s, locals={"x": x, "y": y}) for s in homogeneous_solutions]
+    for f in solutions:
+        if grad_shafranov(f) != 0:
+            raise RuntimeError("%s is not a solution of the homogeneous equation" % f)
+    for d in range(7, degree + 1):
+        solutions += homogeneous_solutions_of_degree(d)
+    names = ["psi%d" % (k + 1) for k in range(len(solutions))]
+    for name, expression, rhs in particular_solutions:
+        f = sp.sympify(expression, locals={"x": x, "y": y})
+        if sp.simplify(grad_shafranov(f) - rhs) != 0:
+            raise RuntimeError("%s is not a particular solution" % name)
+        solutions.append(f)
+        names.append(name)
+
+    out = ["# This file was generated by generate_solutions.py: edit that script rather",
+           "# than this file.",
+           "#",
+           "# In this file, we define all the special solutions and the homogeneous solutions to the Grad-Shafranov equation as defined in A.J. Cerfon and J.P. Freidberg, “One size fits all” analytic solutions to the Grad–Shafranov equation, Physics of Plasmas 17, 032502 (2010)",
+           "",
+           "import numpy as np",
+           "",
+           "# Number of homogeneous solutions, psi1, ..., psi%d" % (len(solutions) - 2),
+           "n_homogeneous = %d" % (len(solutions) - 2),
+           ""]
+    for name, f in zip(names, solutions):
+        label = name.replace("psipart", "psipart ") if name.startswith("psipart") else name.replace("psi", "psi ")
+        out += ["# %s and all its derivatives" % label, ""]
+        for d in derivatives:
+            out += ["def %s%s(x,y):" % (name, d), "   return %s" % _code(derivative(f, d)), ""]
+
+    out += ["# Tables of the solutions and of their derivatives. The homogeneous solutions",
+            "# are listed in the order of their coefficients C[0], C[1], ..., and are",
+            "# followed by the particular solutions psipart1 and psipart2, which are",
+            "# multiplied by A and (1-A) respectively",
+            "",
+            "basis = {"]
+    for d in derivatives:
+        out.append("   \"psi%s\": [%s]," % (d, ",".join(name + d for name in names)))
+    out += ["}", ""]
+
+    out += ["# Fused kernels, evaluating the combination of all the functions in",
+            "# basis[name] with the coefficients c: c[0]*psi1 + c[1]*psi2 + ...",
+            ""]
+    for d in derivatives:
+        out.append(_fused_kernel("psi" + d, [derivative(f, d) for f in solutions], len(solutions)))
+    out += ["combination = {"]
+    for d in derivatives:
+        out.append("   \"psi%s\": combination_psi%s," % (d, d))
+    out += ["}", ""]
+    return "\n".join(out)
+
+if __name__ == "__main__":
+    root = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Generate ExactSolutions.py")
+    parser.add_argument("--degree", type=int, default=6,
+                        help="maximum degree of the homogeneous solutions (6 for the 12 solutions of the article)")
+    parser.add_argument("--output", nargs="+",
+                        default=[os.path.join(root, "Solovev", "ExactSolutions.py")])
+    args = parser.parse_args()
+    source = generate(args.degree)
+    for path in args.output:
+        with open(path, "w") as f:
+            f.write(source)
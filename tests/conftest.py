@@ -0,0 +1,13 @@
+# The modules under test are in the directory Solovev, which the scripts
+# main.py add to the module search path in the same way.
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "Solovev"))
+
+# Parameters (epsilon, kappa, delta, A, xsep, ysep) of the examples of the
+# main.py scripts of ITER_Equilibria and Spheromaks, for each equilibrium type
+cases = [(eq_type, parameters)
+         for parameters in [(0.32, 1.7, 0.33, -0.155, 0.88, -0.6), (0.95, 1., 0.2, -0.05, 0.6, -1.2)]
+         for eq_type in ("symmetric", "symmetric_beta_limit", "asym_single_null")]
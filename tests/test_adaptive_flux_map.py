@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+from conftest import cases
+from Equilibrium import solve_equilibrium
+from AdaptiveFluxMap import adaptive_flux_map, contour_segments, interpolate
+from FluxSurfaces import flux_surfaces, boundary_stationary_point
+from PointEvaluation import evaluate_points
+
+@pytest.fixture(scope="module")
+def equilibrium():
+    C, A, _ = solve_equilibrium("asym_single_null", 0.32, 1.7, 0.33, -0.155, 0.88, -0.6)
+    return C, A, adaptive_flux_map(C, A, (0.6, 1.4), (-0.7, 0.6), tol_psi=1e-5)
+
+@pytest.mark.parametrize("eq_type, parameters", cases)
+def test_boundary_is_on_the_contour(eq_type, parameters):
+    C, A, _ = solve_equilibrium(eq_type, *parameters)
+    xb, yb = flux_surfaces(C, A, [1.], 256)
+    width, height = np.ptp(xb), np.ptp(yb)
+    xlim = max(xb.min() - 0.1*width, xb.min()/2), xb.max() + 0.1*width
+    ylim = yb.min() - 0.1*height, yb.max() + 0.1*height
+    tol = 1e-5
+    flux_map = adaptive_flux_map(C, A, xlim, ylim, tol=tol)
+    points = contour_segments(flux_map).reshape(-1, 2)
+    psi, psix, psiy, psixx, psiyy = evaluate_points(C, A, points, quantities=("psi", "psix", "psiy", "psixx", "psiyy")).T
+    gradient = np.hypot(psix, psiy)
+    distance = np.abs(psi)/gradient
+    assert len(points) > 0
+
+    # Within tol wherever the cells of max_level are small enough to resolve
+    # the contour
+    hx = (xlim[1] - xlim[0])/(16 << 8)
+    hy = (ylim[1] - ylim[0])/(16 << 8)
+    resolved = (np.abs(psixx)*hx**2 + np.abs(psiyy)*hy**2)/(8*gradient) < tol/2
+    assert np.max(distance[resolved]) < tol
+
+    # At the beta limit, the Hessian of psi is singular at the stationary
+    # point, and |grad(psi)| only grows quadratically with the distance to it
+    # along the boundary, which is not resolved over a large part of the
+    # inboard side. Otherwise, only the neighbourhood of the X point is not.
+    if eq_type != "symmetric_beta_limit":
+        point = boundary_stationary_point(C, A)
+        if point is not None:
+            separation = np.hypot(points[:, 0] - point[0], points[:, 1] - point[1])
+            distance = distance[separation > 0.02]
+        assert np.max(distance) < tol
+
+def test_interpolation(equilibrium):
+    C, A, flux_map = equilibrium
+    rng = np.random.default_rng(0)
+    x = rng.uniform(0.6, 1.4, 1000)
+    y = rng.uniform(-0.7, 0.6, 1000)
+    exact = evaluate_points(C, A, x, y)[:, 0]
+    assert np.max(np.abs(interpolate(flux_map, x, y) - exact)) < 1e-4
+    # The corners of the domain are inside
+    interpolate(flux_map, [0.6, 1.4], [-0.7, 0.6])
+
+@pytest.mark.parametrize("x, y", [(0.59, 0.), (1.41, 0.), (1., -0.71), (1., 0.61), (np.nan, 0.)])
+def test_interpolation_outside_of_the_domain(equilibrium, x, y):
+    with pytest.raises(ValueError):
+        interpolate(equilibrium[2], [1., x], [0., y])
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+from PIL import Image
+from BatchRenderer import render_animation, render_scan
+
+_options = {"n_theta": 64, "figsize": (3, 3), "dpi": 50}
+
+def _images(paths):
+    return [np.array(Image.open(path)) for path in paths]
+
+def test_scan(tmp_path):
+    kappa = np.linspace(1.5, 1.9, 5)
+    template = str(tmp_path / "serial{:02d}.png")
+    serial = list(render_scan(template, "symmetric", 0.32, kappa, 0.33, -0.155, chunk_size=2, **_options))
+    assert serial == [template.format(i) for i in range(5)]
+    images = _images(serial)
+    assert images[0].shape == (150, 150, 4)
+    assert not np.array_equal(images[0], images[4])
+    # The frames do not depend on the number of processes
+    template = str(tmp_path / "parallel{:02d}.png")
+    parallel = list(render_scan(template, "symmetric", 0.32, kappa, 0.33, -0.155, chunk_size=2, workers=2, **_options))
+    for a, b in zip(images, _images(parallel)):
+        np.testing.assert_array_equal(a, b)
+
+@pytest.mark.filterwarnings("ignore::RuntimeWarning")
+def test_unsolvable_cases_are_empty_frames(tmp_path):
+    # kappa = 0 makes the system singular
+    template = str(tmp_path / "case{}.png")
+    paths = list(render_scan(template, "symmetric", 0.32, [1.7, 0.], 0.33, -0.155, xlim=(0, 1.6), ylim=(-0.8, 0.8),
+                             **_options))
+    good, bad = _images(paths)
+    assert len(np.unique(good.reshape(-1, 4), axis=0)) > len(np.unique(bad.reshape(-1, 4), axis=0))
+
+def test_array_limits(tmp_path):
+    images = []
+    for name, limits in [("tuple", ((0, 1.6), (-0.8, 0.8))), ("array", (np.array([0, 1.6]), np.array([-0.8, 0.8])))]:
+        template = str(tmp_path / (name + "{}.png"))
+        images += _images(render_scan(template, "symmetric", 0.32, 1.7, 0.33, -0.155, xlim=limits[0], ylim=limits[1],
+                                      **_options))
+    np.testing.assert_array_equal(images[0], images[1])
+
+def test_gif(tmp_path):
+    path = str(tmp_path / "scan.gif")
+    render_animation(path, "asym_single_null", 0.32, np.linspace(1.6, 1.8, 3), 0.33, -0.155, 0.88, -0.6, **_options)
+    with Image.open(path) as image:
+        assert image.n_frames == 3
+
+def test_other_formats_need_ffmpeg(tmp_path, monkeypatch):
+    monkeypatch.setattr("shutil.which", lambda name: None)
+    with pytest.raises(RuntimeError, match="ffmpeg"):
+        render_animation(str(tmp_path / "scan.mp4"), "symmetric", 0.32, [1.6, 1.7], 0.33, -0.155, **_options)
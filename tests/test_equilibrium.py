@@ -0,0 +1,41 @@
+import numpy as np
+import ExactSolutions as es
+from Equilibrium import solve_equilibrium
+
+def test_symmetric_matches_hand_assembled_system():
+    # The linear system of the symmetric case, as written by hand in main.py
+    # before it was assembled from ExactSolutions.basis
+    epsilon, kappa, delta, A = 0.32, 1.7, 0.33, -0.155
+    alpha = np.arcsin(delta)
+    curv1 = -(1+alpha)**2/(epsilon*kappa**2)
+    curv2 = -kappa/(epsilon*(np.cos(alpha))**2)
+    curv3 = (1-alpha)**2/(epsilon*kappa**2)
+    xo, xi, xt, yt = 1+epsilon, 1-epsilon, 1-epsilon*delta, kappa*epsilon
+    psi = [getattr(es, "psi%d" % k) for k in range(1, 8)]
+    psix = [getattr(es, "psi%dx" % k) for k in range(1, 8)]
+    psiy = [getattr(es, "psi%dy" % k) for k in range(1, 8)]
+    psixx = [getattr(es, "psi%dxx" % k) for k in range(1, 8)]
+    psiyy = [getattr(es, "psi%dyy" % k) for k in range(1, 8)]
+    M = np.array([[f(xo, 0) for f in psi],
+                  [f(xi, 0) for f in psi],
+                  [f(xt, yt) for f in psi],
+                  [f(xt, yt) for f in psix],
+                  [curv1*fx(xo, 0) + fyy(xo, 0) for fx, fyy in zip(psix, psiyy)],
+                  [curv3*fx(xi, 0) + fyy(xi, 0) for fx, fyy in zip(psix, psiyy)],
+                  [curv2*fy(xt, yt) + fxx(xt, yt) for fy, fxx in zip(psiy, psixx)]], dtype=float)
+    def particular(f, fx, fy, fxx, fyy):
+        return np.array([f(xo, 0), f(xi, 0), f(xt, yt), fx(xt, yt),
+                         curv1*fx(xo, 0) + fyy(xo, 0), curv3*fx(xi, 0) + fyy(xi, 0), curv2*fy(xt, yt) + fxx(xt, yt)])
+    b = -(A*particular(es.psipart1, es.psipart1x, es.psipart1y, es.psipart1xx, es.psipart1yy)
+          + (1-A)*particular(es.psipart2, es.psipart2x, es.psipart2y, es.psipart2xx, es.psipart2yy))
+    expected = np.concatenate((np.linalg.solve(M, b), np.zeros(5)))
+    C, A_out, ysep = solve_equilibrium("symmetric", epsilon, kappa, delta, A, 0., 0.)
+    np.testing.assert_allclose(C[:12], expected, rtol=1e-12, atol=1e-14)
+    assert A_out == A and ysep == -kappa*epsilon
+
+def test_batches_match_single_solves():
+    epsilon = np.array([0.32, 0.5, 0.95])
+    C, A, ysep = solve_equilibrium("asym_single_null", epsilon, 1.7, 0.33, -0.155, 0.88, -0.6)
+    for i, e in enumerate(epsilon):
+        Ci, Ai, yi = solve_equilibrium("asym_single_null", e, 1.7, 0.33, -0.155, 0.88, -0.6)
+        np.testing.assert_allclose(C[i], Ci, rtol=1e-12, atol=1e-14)
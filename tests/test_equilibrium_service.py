@@ -0,0 +1,115 @@
+import asyncio
+import json
+import os
+import numpy as np
+import pytest
+from Equilibrium import parameter_names, solve_equilibrium
+from EquilibriumService import EquilibriumClient, EquilibriumService, serve
+from PointEvaluation import evaluate_grid
+
+_iter = {"eq_type": "asym_single_null", "epsilon": 0.32, "kappa": 1.7, "delta": 0.33, "A": -0.155, "xsep": 0.88, "ysep": -0.6}
+
+def _run(tmp_path, session, **options):
+    # Run session(client, service) against a service on a Unix socket
+    async def run():
+        path = os.path.join(tmp_path, "solovev.sock")
+        server, service = await serve(path, **options)
+        async with server:
+            client = await EquilibriumClient.connect(path)
+            try:
+                return await session(client, service)
+            finally:
+                await client.close()
+    return asyncio.run(run())
+
+def _answer(service, request):
+    return asyncio.run(service._answer(json.dumps(request, allow_nan=True).encode()))
+
+def test_batched_and_cached_solves(tmp_path):
+    epsilon = np.linspace(0.3, 0.34, 20)
+    async def session(client, service):
+        answers = await asyncio.gather(*[client.request(dict(_iter, id=i, epsilon=e)) for i, e in enumerate(epsilon)])
+        again = await client.request(dict(_iter, epsilon=epsilon[3]))
+        return answers, again, dict(service.statistics)
+    answers, again, statistics = _run(tmp_path, session)
+    C, A, ysep = solve_equilibrium("asym_single_null", epsilon, 1.7, 0.33, -0.155, 0.88, -0.6)
+    assert [answer["id"] for answer in answers] == list(range(20))
+    for i, answer in enumerate(answers):
+        np.testing.assert_allclose(answer["C"], C[i], rtol=1e-12, atol=1e-15)
+        assert not answer["cached"]
+    assert again["cached"]
+    assert statistics["solves"] == 20 and statistics["batches"] < 20
+
+def test_grid(tmp_path):
+    grid = {"x": [0.6, 1.4, 50], "y": [-0.7, 0.6, 70], "quantities": ["psi", "psix"], "dtype": "float32"}
+    async def session(client, service):
+        return await client.request(dict(_iter, grid=grid))
+    answer = _run(tmp_path, session, rows_per_frame=16)
+    expected = evaluate_grid(answer["C"], answer["A"], np.linspace(0.6, 1.4, 50), np.linspace(-0.7, 0.6, 70),
+                             quantities=("psi", "psix"), dtype=np.float32)
+    assert answer["grid"].dtype == np.float32
+    np.testing.assert_array_equal(answer["grid"], expected)
+
+@pytest.mark.parametrize("fields", [{"epsilon": float("nan")}, {"A": float("inf")}, {"kappa": "x"},
+                                    {"grid": {"x": [0.6, 1.4, 100000], "y": [-0.7, 0.6, 1000]}},
+                                    {"grid": {"x": [0.6, 1.4, 2.5], "y": [-0.7, 0.6, 4]}},
+                                    {"grid": {"x": [0.6, float("inf"), 5], "y": [-0.7, 0.6, 4]}}])
+def test_invalid_requests(fields):
+    service = EquilibriumService(max_grid_values=1 << 20)
+    header, grid = _answer(service, dict(_iter, id=2, **fields))
+    assert header["id"] == 2 and "error" in header and grid is None
+    json.loads(json.dumps(header, allow_nan=False))
+    assert len(service.cache) == 0
+
+@pytest.mark.parametrize("eq_type, name", [("symmetric", "epsilon"), ("symmetric", "A"),
+                                           ("symmetric_beta_limit", "delta"), ("asym_single_null", "A"),
+                                           ("asym_single_null", "ysep")])
+def test_missing_parameters(eq_type, name):
+    service = EquilibriumService()
+    request = dict(_iter, eq_type=eq_type)
+    del request[name]
+    header, _ = _answer(service, request)
+    assert header["error"] == "ValueError: missing parameter %s" % name
+    assert service.statistics["requests"] == 0
+
+@pytest.mark.parametrize("eq_type, names", [("symmetric", ("xsep", "ysep")),
+                                            ("symmetric_beta_limit", ("A", "xsep", "ysep"))])
+def test_unused_parameters_can_be_omitted(eq_type, names):
+    request = {name: value for name, value in _iter.items() if name not in names}
+    header, _ = _answer(EquilibriumService(), dict(request, eq_type=eq_type))
+    C, A, ysep = solve_equilibrium(eq_type, *[_iter[name] for name in parameter_names])
+    np.testing.assert_allclose(header["C"], C, rtol=1e-12, atol=1e-15)
+
+@pytest.mark.filterwarnings("ignore::RuntimeWarning")
+@pytest.mark.parametrize("fields, message", [({"epsilon": 0.}, "singular system for the parameters [0.0, 1.7, "),
+                                             ({"kappa": 0.}, "no finite solution for the parameters [0.32, 0.0, ")])
+def test_failed_solves(fields, message):
+    header, _ = _answer(EquilibriumService(), dict(_iter, **fields))
+    assert message in header["error"]
+
+def test_client_going_away(tmp_path):
+    # Only the grid which is being sent when the client goes away is
+    # evaluated, in part, and not the grids of the next 19 requests
+    grid = {"x": [0.6, 1.4, 1000], "y": [-0.7, 0.6, 1000]}
+    async def session(client, service):
+        reader, writer = await asyncio.open_unix_connection(os.path.join(tmp_path, "solovev.sock"))
+        for i in range(20):
+            writer.write(json.dumps(dict(_iter, id=i, grid=grid)).encode() + b"\n")
+        await writer.drain()
+        await reader.readline()
+        writer.transport.abort()
+        # The service still answers the other clients
+        await client.request(_iter)
+        await asyncio.sleep(0.5)
+        return dict(service.statistics)
+    statistics = _run(tmp_path, session, frame_size=1 << 16)
+    assert statistics["requests"] == 21 and statistics["grid_bytes"] < 4*(1 << 16)
+
+def test_shutdown_with_open_connections(tmp_path):
+    errors = []
+    async def session(client, service):
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: errors.append(context))
+        await client.request(_iter)
+        await asyncio.open_unix_connection(os.path.join(tmp_path, "solovev.sock"))
+    _run(tmp_path, session)
+    assert errors == []
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+from Equilibrium import solve_equilibrium
+from FieldLineTracer import magnetic_field, trace_field_lines, trace_guiding_centers
+from PointEvaluation import evaluate_points
+
+@pytest.fixture(scope="module")
+def equilibrium():
+    C, A, _ = solve_equilibrium("symmetric", 0.32, 1.7, 0.33, -0.155, 0., 0.)
+    return C, A
+
+def _psi_error(C, A, method, step):
+    # Largest change of psi along the field lines, relative to psi on axis
+    x0 = np.linspace(1.05, 1.25, 4)
+    y0 = np.zeros(4)
+    phi = np.linspace(0, 20*np.pi, 11)
+    x, y = trace_field_lines(C, A, 1., x0, y0, phi, method=method, step=step)
+    psi = evaluate_points(C, A, x.ravel(), y.ravel())[:, 0].reshape(x.shape)
+    psi_start = evaluate_points(C, A, x0, y0)[:, 0]
+    return np.max(np.abs(psi - psi_start[:, np.newaxis]))/np.max(np.abs(psi_start))
+
+def test_field_lines_stay_on_their_flux_surface(equilibrium):
+    C, A = equilibrium
+    assert _psi_error(C, A, "rk45", None) < 1e-7
+    # The midpoint rule does not conserve psi exactly, but its error is
+    # bounded and of second order in the step
+    error = _psi_error(C, A, "midpoint", 0.02)
+    assert error < 1e-4
+    assert 3 < error/_psi_error(C, A, "midpoint", 0.01) < 5
+
+def test_workers(equilibrium):
+    C, A = equilibrium
+    x0 = np.linspace(1.05, 1.25, 6)
+    phi = np.linspace(0, 2*np.pi, 5)
+    expected = trace_field_lines(C, A, 1., x0, np.zeros(6), phi)
+    for workers in (None, 3):
+        x, y = trace_field_lines(C, A, 1., x0, np.zeros(6), phi, workers=workers)
+        # The steps of the adaptive method depend on the batches
+        np.testing.assert_allclose(x, expected[0], rtol=1e-8)
+        np.testing.assert_allclose(y, expected[1], rtol=1e-8, atol=1e-8)
+
+def test_guiding_center_invariants(equilibrium):
+    # The energy vpar**2/2 + mu*B and the canonical toroidal momentum
+    # psi + rho*vpar*x*b_phi are conserved along the orbits
+    C, A = equilibrium
+    rho = 1e-3
+    x0 = np.linspace(1.05, 1.2, 6)
+    vpar0 = np.linspace(-0.8, 0.8, 6)
+    mu = np.full(6, 0.3)
+    t = np.linspace(0, 30, 7)
+    x, phi, y, vpar = trace_guiding_centers(C, A, 1., rho, x0, 0., 0., vpar0, mu, t, rtol=1e-12, atol=1e-14)
+    assert np.ptp(y) > 0.1
+    BR, Bphi, BZ = [b.reshape(x.shape) for b in magnetic_field(C, A, 1., x.ravel(), y.ravel())]
+    B = np.sqrt(BR**2 + Bphi**2 + BZ**2)
+    energy = vpar**2/2 + mu[:, np.newaxis]*B
+    psi = evaluate_points(C, A, x.ravel(), y.ravel())[:, 0].reshape(x.shape)
+    p_phi = psi + rho*vpar*x*Bphi/B
+    assert np.max(np.abs(energy - energy[:, :1])) < 1e-11*np.max(energy)
+    assert np.max(np.abs(p_phi - p_phi[:, :1])) < 1e-11*np.max(np.abs(p_phi))
+
+def test_midpoint_iterations_which_do_not_converge(equilibrium):
+    C, A = equilibrium
+    x0 = np.array([1.05, 1.1])
+    phi = np.linspace(0, 1, 3)
+    x, y = trace_field_lines(C, A, 1., x0, np.zeros(2), phi, method="midpoint", step=0.5, max_iterations=2)
+    np.testing.assert_array_equal(x[:, 0], x0)
+    assert np.all(np.isnan(x[:, 1:])) and np.all(np.isnan(y[:, 1:]))
+    x, y = trace_field_lines(C, A, 1., x0, np.zeros(2), phi, method="midpoint", step=0.5)
+    assert np.all(np.isfinite(x)) and np.all(np.isfinite(y))
@@ -0,0 +1,39 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+sp = pytest.importorskip("sympy")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import generate_solutions
+
+def _module(source):
+    namespace = {}
+    exec(compile(source, "ExactSolutions.py", "exec"), namespace)
+    return namespace
+
+def test_generated_file_is_up_to_date():
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "Solovev", "ExactSolutions.py")
+    with open(path) as f:
+        assert generate_solutions.generate(6) == f.read()
+
+def test_higher_degree_solutions():
+    module = _module(generate_solutions.generate(8))
+    basis, combination = module["basis"], module["combination"]
+    assert module["n_homogeneous"] == 16
+    rng = np.random.default_rng(0)
+    x = rng.uniform(0.2, 2., 100)
+    y = rng.uniform(-2., 2., 100)
+    # The additional solutions are homogeneous solutions of the Grad-Shafranov
+    # equation, and the particular solutions give A and (1-A)*x**2
+    rhs = [0.]*16 + [1., x**2]
+    for k, expected in enumerate(rhs):
+        f = lambda name: np.broadcast_to(basis[name][k](x, y), x.shape)
+        residual = f("psixx") - f("psix")/x + f("psiyy") - expected
+        scale = np.abs(f("psixx")) + np.abs(f("psix")/x) + np.abs(f("psiyy")) + 1
+        assert np.max(np.abs(residual)/scale) < 1e-12
+    # The fused kernels match the sums over the basis
+    c = rng.standard_normal(18)
+    for name in ("psi", "psix", "psiyy", "psixxy"):
+        expected = sum(c[k]*basis[name][k](x, y) for k in range(18))
+        np.testing.assert_allclose(combination[name](c, x, y), expected, rtol=1e-10, atol=1e-10*np.max(np.abs(expected)))
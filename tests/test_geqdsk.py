@@ -0,0 +1,100 @@
+import io
+import numpy as np
+import pytest
+from conftest import cases
+from Equilibrium import solve_equilibrium
+from GEQDSK import write_geqdsk, write_geqdsk_scan
+from FluxSurfaces import magnetic_axis, boundary_stationary_point, safety_factor
+
+def _read_geqdsk(text):
+    # Minimal reader of the g-files written by write_geqdsk
+    lines = text.splitlines()
+    nw, nh = map(int, lines[0][48:].split()[1:3])
+    values = []
+    position = 1
+    def read(n):
+        nonlocal position
+        while len(values) < n:
+            line = lines[position]
+            values.extend(float(line[k:k+16]) for k in range(0, len(line), 16))
+            position += 1
+        result = np.array(values[:n])
+        del values[:]
+        return result
+    g = dict(zip(["rdim", "zdim", "rcentr", "rleft", "zmid", "rmaxis", "zmaxis", "simag", "sibry", "bcentr",
+                  "current", "simag2", "_", "rmaxis2", "_", "zmaxis2", "_", "sibry2", "_", "_"], read(20)))
+    for name in ("fpol", "pres", "ffprim", "pprime"):
+        g[name] = read(nw)
+    g["psirz"] = read(nw*nh).reshape(nh, nw)
+    g["qpsi"] = read(nw)
+    g["nbbbs"], g["limitr"] = map(int, lines[position].split())
+    position += 1
+    g["rzbbbs"] = read(2*g["nbbbs"]).reshape(-1, 2)
+    g["rzlim"] = read(2*g["limitr"]).reshape(-1, 2)
+    g["nw"], g["nh"] = nw, nh
+    return g
+
+@pytest.mark.parametrize("current, B0", [(15e6, 5.3), (-15e6, 5.3), (15e6, -5.3), (-15e6, -5.3)])
+def test_cocos_signs(current, B0):
+    C, A, _ = solve_equilibrium("symmetric", 0.32, 1.7, 0.33, -0.155, 0., 0.)
+    file = io.StringIO()
+    psi0, Ip = write_geqdsk(file, C, A, 6.2, B0, current=current, nw=33, nh=33)
+    g = _read_geqdsk(file.getvalue())
+    assert Ip == pytest.approx(current) and g["current"] == pytest.approx(current)
+    # COCOS 1: psi increases from the axis to the boundary for Ip > 0, q has
+    # the sign of Ip*B0 and F the sign of B0
+    assert np.sign(g["sibry"] - g["simag"]) == np.sign(current)
+    assert np.all(np.sign(g["qpsi"]) == np.sign(current*B0))
+    assert np.all(np.sign(g["fpol"]) == np.sign(B0))
+    assert g["fpol"][-1] == pytest.approx(6.2*B0)
+    # psi on the grid is the flux written for the axis and the boundary
+    extremum = g["psirz"].min() if current > 0 else g["psirz"].max()
+    assert extremum == pytest.approx(g["simag"], rel=1e-2)
+    assert g["rmaxis"] == g["rmaxis2"] and g["simag"] == g["simag2"]
+    # Radial force balance: p' and FF' with respect to psi, as written, give
+    # the Grad-Shafranov equation satisfied by the flux map
+    mu0 = 4e-7*np.pi
+    R = g["rleft"] + np.linspace(0, g["rdim"], g["nw"])
+    Z = g["zmid"] + np.linspace(-g["zdim"]/2, g["zdim"]/2, g["nh"])
+    hR, hZ = R[1] - R[0], Z[1] - Z[0]
+    psi = g["psirz"]
+    i, j = g["nh"]//2, g["nw"]//2
+    delta_star = ((psi[i, j+1] - 2*psi[i, j] + psi[i, j-1])/hR**2 - (psi[i, j+1] - psi[i, j-1])/(2*hR*R[j])
+                  + (psi[i+1, j] - 2*psi[i, j] + psi[i-1, j])/hZ**2)
+    expected = -mu0*R[j]**2*g["pprime"][0] - g["ffprim"][0]
+    assert delta_star == pytest.approx(expected, rel=1e-2)
+
+@pytest.mark.parametrize("eq_type, parameters", cases)
+def test_q_is_finite_on_the_boundary(eq_type, parameters):
+    C, A, _ = solve_equilibrium(eq_type, *parameters)
+    axis = magnetic_axis(C, A)
+    file = io.StringIO()
+    write_geqdsk(file, C, A, 6.2, 5.3, current=15e6, nw=33, nh=33)
+    g = _read_geqdsk(file.getvalue())
+    assert np.all(np.isfinite(g["qpsi"]))
+    # q remains bounded on the separatrix, with the edge value of psi_n = q_edge
+    psi0 = -g["simag"]/axis[2]
+    F0 = 6.2**2*5.3/psi0
+    if boundary_stationary_point(C, A) is not None:
+        q_edge = -safety_factor(C, A, F0, [0.995], axis=axis)[0]
+        assert g["qpsi"][-1] == pytest.approx(q_edge, rel=1e-6)
+    else:
+        assert g["qpsi"][-1] == pytest.approx(-safety_factor(C, A, F0, [1.], axis=axis)[0], rel=1e-6)
+
+def test_path_objects(tmp_path):
+    C, A, _ = solve_equilibrium("symmetric", 0.32, 1.7, 0.33, -0.155, 0., 0.)
+    path = tmp_path / "g000001"
+    write_geqdsk(path, C, A, 6.2, 5.3, current=15e6, nw=17, nh=17)
+    g = _read_geqdsk(path.read_text())
+    assert g["nw"] == 17 and g["current"] == pytest.approx(15e6)
+
+@pytest.mark.filterwarnings("ignore::RuntimeWarning")
+def test_scan_goes_on_after_failed_cases(tmp_path):
+    # There is no plasma for kappa = 0
+    log = io.StringIO()
+    template = str(tmp_path / "g{}")
+    paths = list(write_geqdsk_scan(template, "symmetric", 0.32, [1.7, 0., 1.8], 0.33, -0.155, 0., 0., 6.2, 5.3,
+                                   current=15e6, log=log, nw=17, nh=17))
+    assert paths == [template.format(0), None, template.format(2)]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["g0", "g2"]
+    assert log.getvalue().startswith("case 1: ")
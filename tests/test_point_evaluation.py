@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+import ExactSolutions as es
+from conftest import cases
+from Equilibrium import solve_equilibrium
+from PointEvaluation import evaluate_grid, evaluate_points, quantity_names, rounding_error_bound
+
+def _grid(parameters, ysep, n=200):
+    epsilon, kappa = parameters[:2]
+    return np.linspace(1-epsilon-0.05, 1+epsilon+0.1, n), np.linspace(ysep-0.05, kappa*epsilon+0.025, n)
+
+@pytest.mark.parametrize("eq_type, parameters", cases)
+def test_grid_matches_hand_written_sum(eq_type, parameters):
+    # psi as computed by main.py before the chunked evaluation was introduced
+    C, A, ysep = solve_equilibrium(eq_type, *parameters)
+    x, y = _grid(parameters, ysep)
+    X, Y = np.meshgrid(x, y)
+    Z = C[0]*es.psi1(X,Y)+C[1]*es.psi2(X,Y)+C[2]*es.psi3(X,Y)+C[3]*es.psi4(X,Y)+C[4]*es.psi5(X,Y) \
+        +C[5]*es.psi6(X,Y)+C[6]*es.psi7(X,Y)+C[7]*es.psi8(X,Y)+C[8]*es.psi9(X,Y) \
+        +C[9]*es.psi10(X,Y)+C[10]*es.psi11(X,Y)+C[11]*es.psi12(X,Y) \
+        +A*es.psipart1(X,Y)+(1-A)*es.psipart2(X,Y)
+    np.testing.assert_allclose(evaluate_grid(C, A, x, y), Z, rtol=0, atol=1e-13*np.abs(Z).max())
+    np.testing.assert_array_equal(evaluate_grid(C, A, x, y, chunk_size=1000, workers=3), evaluate_grid(C, A, x, y))
+
+def test_points_in_place_and_in_chunks():
+    C, A, _ = solve_equilibrium("asym_single_null", 0.32, 1.7, 0.33, -0.155, 0.88, -0.6)
+    rng = np.random.default_rng(0)
+    points = np.column_stack((rng.uniform(0.7, 1.3, 1000), rng.uniform(-0.6, 0.5, 1000)))
+    quantities = ("psi", "psix", "psiyy")
+    expected = evaluate_points(C, A, points, quantities=quantities)
+    out = np.empty((1000, 3))
+    assert evaluate_points(C, A, points, quantities=quantities, out=out, chunk_size=77, workers=None) is out
+    np.testing.assert_array_equal(out, expected)
+    for k, name in enumerate(quantities):
+        exact = sum(c*np.broadcast_to(f(points[:, 0], points[:, 1]), (1000,))
+                    for c, f in zip(np.concatenate((C, [A, 1-A])), es.basis[name]))
+        np.testing.assert_allclose(out[:, k], exact, rtol=0, atol=1e-12*np.abs(exact).max())
+
+@pytest.mark.parametrize("eq_type, parameters", cases)
+def test_single_precision_within_documented_bound(eq_type, parameters):
+    # The bound at the end of PointEvaluation.py, for all the quantities, in
+    # single precision and with the sums accumulated in double precision
+    C, A, ysep = solve_equilibrium(eq_type, *parameters)
+    x, y = _grid(parameters, ysep, 100)
+    X, Y = np.meshgrid(x, y)
+    exact = evaluate_grid(C, A, x, y, quantities=quantity_names)
+    single = evaluate_grid(C, A, x, y, quantities=quantity_names, dtype=np.float32)
+    mixed = evaluate_grid(C, A, x, y, quantities=quantity_names, dtype=np.float32, accumulate=np.float64)
+    assert single.dtype == np.float32 and mixed.dtype == np.float64
+    for k, name in enumerate(quantity_names):
+        bound = rounding_error_bound(C, A, X.ravel(), Y.ravel(), quantity=name).reshape(X.shape)
+        assert np.all(np.abs(single[..., k] - exact[..., k]) <= bound)
+        assert np.all(np.abs(mixed[..., k] - exact[..., k]) <= bound)
+
+def test_accumulation_type():
+    C, A, ysep = solve_equilibrium("asym_single_null", 0.32, 1.7, 0.33, -0.155, 0.88, -0.6)
+    x, y = _grid((0.32, 1.7), ysep, 50)
+    single = evaluate_grid(C, A, x, y, dtype=np.float32)
+    mixed = evaluate_grid(C, A, x, y, dtype=np.float32, accumulate=np.float64)
+    # The mixed precision sum is not the single precision fused kernel, even
+    # when it is written into a double precision output
+    out = np.empty(single.shape)
+    evaluate_grid(C, A, x, y, dtype=np.float32, accumulate=np.float64, out=out)
+    np.testing.assert_array_equal(out, mixed)
+    assert np.any(out != single)
+    # and single precision without accumulation uses the fused kernel
+    out = np.empty(single.shape)
+    evaluate_grid(C, A, x, y, dtype=np.float32, out=out)
+    np.testing.assert_array_equal(out, single)
+    # Accumulating in the type of the basis functions changes nothing
+    np.testing.assert_array_equal(evaluate_grid(C, A, x, y, dtype=np.float32, accumulate=np.float32), single)
+
+def test_memory_mapped_points(tmp_path):
+    # The use case at the top of PointEvaluation.py: nodes and results in
+    # .npy files, and a single quantity in an output of shape (N,)
+    C, A, _ = solve_equilibrium("symmetric", 0.32, 1.7, 0.33, -0.155, 0., 0.)
+    rng = np.random.default_rng(1)
+    nodes = np.column_stack((rng.uniform(0.7, 1.3, 5000), rng.uniform(-0.5, 0.5, 5000)))
+    np.save(tmp_path / "nodes.npy", nodes)
+    points = np.load(tmp_path / "nodes.npy", mmap_mode="r")
+    out = np.lib.format.open_memmap(str(tmp_path / "psi.npy"), mode="w+", shape=(5000, 2))
+    evaluate_points(C, A, points, quantities=("psi", "psiy"), out=out, chunk_size=1024)
+    out.flush()
+    expected = evaluate_points(C, A, nodes[:, 0], nodes[:, 1], quantities=("psi", "psiy"))
+    np.testing.assert_array_equal(np.load(tmp_path / "psi.npy"), expected)
+    psi = np.empty(5000)
+    evaluate_points(C, A, points, out=psi, chunk_size=1000)
+    np.testing.assert_array_equal(psi, expected[:, 0])
+
+def test_invalid_arguments():
+    C, A, _ = solve_equilibrium("symmetric", 0.32, 1.7, 0.33, -0.155, 0., 0.)
+    with pytest.raises(ValueError):
+        evaluate_points(C, A, np.ones((10, 3)))
+    with pytest.raises(ValueError):
+        evaluate_points(C, A, np.ones(10), np.ones(9))
+    with pytest.raises(ValueError):
+        evaluate_points(C, A, np.ones((10, 2)), quantities=("psiz",))
+    with pytest.raises(ValueError):
+        evaluate_points(C, A, np.ones((10, 2)), quantities=("psi", "psix"), out=np.empty(10))
+    with pytest.raises(ValueError):
+        evaluate_points(C[:11], A, np.ones((10, 2)))
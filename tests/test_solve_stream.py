@@ -0,0 +1,95 @@
+import csv
+import io
+import json
+import os
+import struct
+import subprocess
+import sys
+import numpy as np
+from Equilibrium import solve_equilibrium
+
+_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "Solovev", "solve_stream.py")
+
+_csv = """case,eq_type,epsilon,kappa,delta,A,xsep,ysep
+iter,asym_single_null,0.32,1.7,0.33,-0.155,0.88,-0.6
+bad,unknown,0.32,1.7,0.33,-0.155,,
+spheromak,symmetric,0.95,1,0.2,-0.05,,
+"""
+
+def _run(arguments, data):
+    result = subprocess.run([sys.executable, _script] + arguments, input=data, capture_output=True, check=True)
+    return result.stdout, result.stderr.decode()
+
+def test_jsonl_output():
+    out, log = _run(["--input-format", "csv", "--batch-size", "2"], _csv.encode())
+    records = [json.loads(line) for line in out.decode().splitlines()]
+    assert [r["case"] for r in records] == ["iter", "bad", "spheromak"]
+    assert [r["index"] for r in records] == [0, 1, 2]
+    C, A, ysep = solve_equilibrium("asym_single_null", 0.32, 1.7, 0.33, -0.155, 0.88, -0.6)
+    np.testing.assert_array_equal(records[0]["C"], C)
+    assert records[0]["ysep"] == -0.6 and "error" not in records[0]
+    assert records[1]["C"][0] is None and "unknown" in records[1]["error"]
+    assert "record 1" in log
+    C, A, ysep = solve_equilibrium("symmetric", 0.95, 1., 0.2, -0.05, 0., 0.)
+    np.testing.assert_array_equal(records[2]["C"], C)
+
+def test_npy_input_and_binary_output():
+    parameters = np.array([[0.32, 1.7, 0.33, -0.155, 0.88, -0.6], [0.3, 1.6, 0.3, -0.1, 0.9, -0.55]])
+    data = io.BytesIO()
+    np.save(data, parameters)
+    out, _ = _run(["--input-format", "npy", "--eq-type", "asym_single_null", "--output-format", "binary", "--derived"],
+                  data.getvalue())
+    header, _, frames = out.partition(b"\n")
+    columns = json.loads(header)["columns"]
+    (n,) = struct.unpack("<Q", frames[:8])
+    frame = np.frombuffer(frames[8:8+n*len(columns)*8], dtype="<f8").reshape(n, len(columns))
+    assert n == 2 and len(frames) == 8 + n*len(columns)*8
+    C, A, ysep = solve_equilibrium("asym_single_null", *parameters.T)
+    np.testing.assert_array_equal(frame[:, columns.index("C0"):columns.index("C11")+1], C)
+    np.testing.assert_array_equal(frame[:, columns.index("index")], [0, 1])
+    assert np.all(np.isfinite(frame[:, columns.index("psi_axis")]))
+
+_jsonl = "".join(json.dumps(record) + "\n" for record in [
+    {"case": "iter", "eq_type": "asym_single_null", "epsilon": 0.32, "kappa": 1.7, "delta": 0.33, "A": -0.155,
+     "xsep": 0.88, "ysep": -0.6},
+    {"case": "spheromak", "epsilon": 0.95, "kappa": 1., "delta": 0.2, "A": -0.05, "shot": 7}]).encode()
+
+def test_csv_output():
+    out, _ = _run(["--input-format", "jsonl", "--output-format", "csv", "--fields", "case,shot"], _jsonl)
+    rows = list(csv.DictReader(io.StringIO(out.decode())))
+    assert [row["case"] for row in rows] == ["iter", "spheromak"]
+    assert [row["shot"] for row in rows] == ["", "7"]
+    C, A, ysep = solve_equilibrium("asym_single_null", 0.32, 1.7, 0.33, -0.155, 0.88, -0.6)
+    assert float(rows[0]["C6"]) == C[6] and float(rows[0]["ysep"]) == ysep
+
+def test_csv_rejects_fields_of_later_records():
+    # By default, the columns are the fields of the first record
+    result = subprocess.run([sys.executable, _script, "--input-format", "jsonl", "--output-format", "csv"],
+                            input=_jsonl, capture_output=True)
+    assert result.returncode != 0 and "shot" in result.stderr.decode()
+
+def test_malformed_jsonl_lines():
+    lines = _jsonl.decode().splitlines()
+    data = "\n".join([lines[0], "[1, 2]", '{"epsilon": 0.3,', lines[1]]) + "\n"
+    out, log = _run(["--input-format", "jsonl"], data.encode())
+    records = [json.loads(line) for line in out.decode().splitlines()]
+    assert [r["index"] for r in records] == [0, 1, 2, 3]
+    assert [r.get("case") for r in records] == ["iter", None, None, "spheromak"]
+    assert "not a JSON object" in records[1]["error"] and "invalid JSON" in records[2]["error"]
+    assert "error" not in records[0] and "error" not in records[3]
+    assert "record 1" in log and "record 2" in log
+
+def test_parameters_which_can_be_omitted():
+    base = {"epsilon": 0.32, "kappa": 1.7, "delta": 0.33}
+    data = "".join(json.dumps(dict(base, **record)) + "\n" for record in [
+        {"eq_type": "symmetric", "A": -0.155},
+        {"eq_type": "symmetric_beta_limit"},
+        {"eq_type": "symmetric"},
+        {"eq_type": "asym_single_null", "A": -0.155, "ysep": -0.6}]).encode()
+    out, _ = _run(["--input-format", "jsonl"], data)
+    records = [json.loads(line) for line in out.decode().splitlines()]
+    assert "error" not in records[0] and "error" not in records[1]
+    assert records[2]["error"] == "missing value of A"
+    assert records[3]["error"] == "missing value of xsep"
+    out, _ = _run(["--input-format", "jsonl", "-D", "A=-0.155", "-D", "xsep=0.88"], data)
+    assert all("error" not in json.loads(line) for line in out.decode().splitlines())
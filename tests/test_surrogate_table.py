@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from Equilibrium import solve_equilibrium, solve_parameter_sets
+from SurrogateTable import SurrogateTable, build_table
+
+_kappa = np.linspace(1.5, 1.9, 9)
+_delta = np.array([0.2, 0.25, 0.3, 0.4, 0.45])
+
+@pytest.fixture(scope="module")
+def table(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("table"))
+    build_table(path, "asym_single_null", 0.32, _kappa, _delta, -0.155, 0.88, -0.6, derived=False, batch_size=7)
+    return SurrogateTable(path)
+
+def test_nodes(table):
+    C, A, ysep = table.coefficients(kappa=_kappa[3], delta=_delta[2])
+    expected = solve_equilibrium("asym_single_null", 0.32, _kappa[3], _delta[2], -0.155, 0.88, -0.6)[0]
+    np.testing.assert_allclose(C, expected, rtol=1e-12, atol=1e-15)
+    assert A == -0.155 and ysep == -0.6
+
+def test_scalar_and_batched_queries(table):
+    kappa = np.array([1.51, 1.72, 1.9])
+    delta = np.array([0.2, 0.33, 0.41])
+    values, error = table(kappa=kappa, delta=delta)
+    for i in range(3):
+        v, e = table(kappa=kappa[i], delta=delta[i])
+        np.testing.assert_allclose(v, values[i], rtol=1e-14, atol=1e-15)
+        np.testing.assert_allclose(e, error[i], rtol=1e-14)
+
+def test_error_estimates(table):
+    # The table has no magnetic axis, whose values are NaN
+    actual, estimate = [a[:, :-3] for a in table.validate(200)]
+    assert np.all(np.isfinite(actual))
+    assert np.median(actual/estimate) < 1
+
+def test_queries_outside_of_the_table(table):
+    with pytest.raises(ValueError):
+        table(kappa=1.95, delta=0.3)
+    with pytest.raises(ValueError):
+        table(kappa=1.7, delta=0.3, epsilon=0.33)
+    with pytest.raises(TypeError):
+        table(kappa=1.7)
+    table(kappa=1.95, delta=0.3, extrapolate=True)
+
+def test_error_estimates_are_bounds(tmp_path):
+    table = build_table(str(tmp_path), "asym_single_null", 0.32, np.linspace(1.5, 1.9, 9), np.linspace(0.2, 0.45, 6),
+                        np.linspace(-0.25, -0.05, 5), 0.88, -0.6, derived=False)
+    actual, estimate = [a[:, :-3] for a in table.validate(300)]
+    assert np.all(actual <= estimate)
+
+def test_all_parameters_fixed(tmp_path):
+    table = build_table(str(tmp_path), "symmetric", 0.32, 1.7, 0.33, -0.155)
+    values, error = table()
+    expected = solve_parameter_sets("symmetric", np.array([[0.32, 1.7, 0.33, -0.155, 0., 0.]]))[0]
+    np.testing.assert_array_equal(values, expected)
+    assert np.all(error <= 4*np.finfo(float).eps*np.abs(values))
+    actual, estimate = table.validate(5)
+    assert np.all(actual <= estimate)
@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+from conftest import cases
+from Equilibrium import solve_equilibrium
+from Validation import check_basis, validate_equilibria
+
+def test_basis_solves_the_grad_shafranov_equation():
+    check_basis()
+
+@pytest.mark.parametrize("eq_type, parameters", cases)
+def test_corrupted_solutions_are_rejected(eq_type, parameters):
+    epsilon, kappa, delta, A_in, xsep, ysep = parameters
+    C, A, _ = solve_equilibrium(eq_type, *parameters)
+    assert validate_equilibria(eq_type, epsilon, kappa, delta, A_in, xsep, ysep, C, A)["valid"]
+
+    corrupted = C.copy()
+    corrupted[1] *= 1 + 1e-6
+    assert not validate_equilibria(eq_type, epsilon, kappa, delta, A_in, xsep, ysep, corrupted, A)["valid"]
+    assert not validate_equilibria(eq_type, epsilon, kappa, delta, A_in, xsep, ysep, C, A + 0.3)["valid"]
+    assert not validate_equilibria(eq_type, epsilon, kappa, delta, A_in, xsep, ysep, C, np.nan)["valid"]
+
+def test_batches():
+    epsilon = np.array([0.32, 0.5, 0.95])
+    C, A, _ = solve_equilibrium("asym_single_null", epsilon, 1.7, 0.33, -0.155, 0.88, -0.6)
+    C[2, 0] += 1e-3
+    result = validate_equilibria("asym_single_null", epsilon, 1.7, 0.33, -0.155, 0.88, -0.6, C, A)
+    np.testing.assert_array_equal(result["valid"], [True, True, False])